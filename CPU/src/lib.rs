@@ -1,5 +1,10 @@
+use pyo3::buffer::PyBuffer;
+use pyo3::exceptions::{PyBufferError, PyValueError};
 use pyo3::prelude::*;
-use sha1::{Digest, Sha1};
+use std::sync::atomic::AtomicBool;
+use std::time::{Duration, Instant};
+
+mod search;
 
 #[pyclass]
 #[derive(Clone)]
@@ -16,29 +21,119 @@ impl DUCOHasher {
         }
     }
 
+    /// Searches nonces 0..=diff*job_mul for expected_hash, returns (nonce, hashed):
+    /// nonce is 0 if none match, hashed is how many nonces were actually hashed.
+    /// The GIL is released while hashing so other Python threads keep running.
+    /// threads > 1 splits the range across native threads, 0 uses every allowed CPU.
+    /// timeout (seconds) gives up on the job, also returning nonce 0.
     #[allow(non_snake_case)]
-    pub fn DUCOS1(&self, expected_hash: &[u8], diff: u128, job_mul: u128) -> u128 {
-        let mut buffer = itoa::Buffer::new();
-        let base_hasher = Sha1::new().chain_update(&self.base_data);
-
-        for nonce in 0..(job_mul * diff + 1) {
-            let mut hasher = base_hasher.clone();
-            let str = buffer.format(nonce);
-            hasher.update(str.as_bytes());
+    #[pyo3(signature = (expected_hash, diff, job_mul, threads=1, timeout=None))]
+    pub fn DUCOS1(
+        &self,
+        py: Python<'_>,
+        expected_hash: &[u8],
+        diff: u128,
+        job_mul: u128,
+        threads: usize,
+        timeout: Option<f64>,
+    ) -> (u128, u64) {
+        let end = (job_mul * diff + 1).min(u64::MAX as u128) as u64;
+        let stop = AtomicBool::new(false);
+        let deadline = timeout
+            .and_then(|t| Duration::try_from_secs_f64(t.max(0.0)).ok())
+            .and_then(|t| Instant::now().checked_add(t));
+        let (nonce, hashed) = py.allow_threads(|| {
+            search::search(
+                &self.base_data,
+                expected_hash,
+                0,
+                end,
+                threads,
+                &stop,
+                deadline,
+            )
+        });
+        (nonce.map_or(0, u128::from), hashed)
+    }
 
-            let mut output = [0u8; 20];
-            hasher.finalize_into((&mut output).into());
+    /// Fills `out` with the digests of base + nonce for nonces start,
+    /// start + 1, ... (len(out) // 20 of them) and returns how many were written.
+    /// `out` is any writable C-contiguous byte buffer: bytearray, array("B"),
+    /// a uint8 NumPy array. No Python objects are created per hash.
+    #[pyo3(signature = (out, start=0, threads=1))]
+    pub fn hash_range(
+        &self,
+        py: Python<'_>,
+        out: PyBuffer<u8>,
+        start: u64,
+        threads: usize,
+    ) -> PyResult<usize> {
+        let (out_ptr, out_len) = writable(&out)?;
+        let count = out_len / search::DIGEST_SIZE;
+        if start.checked_add(count as u64).is_none() {
+            return Err(PyValueError::new_err("nonce range overflows u64"));
+        }
+        // Pointers are passed as addresses so the closure can leave the GIL;
+        // the exporter keeps the memory alive and unresized while `out` is held.
+        py.allow_threads(|| {
+            let out = unsafe { std::slice::from_raw_parts_mut(out_ptr as *mut u8, out_len) };
+            search::hash_range(&self.base_data, start, out, threads)
+        });
+        Ok(count)
+    }
 
-            if &output[..] == expected_hash {
-                return nonce;
-            }
+    /// Fills slot i of `out` with the digest of base + nonces[i].
+    /// `nonces` is a C-contiguous buffer of unsigned 64-bit integers
+    /// (array("Q"), a uint64 NumPy array), `out` needs 20 bytes per nonce.
+    #[pyo3(signature = (nonces, out, threads=1))]
+    pub fn hash_nonces(
+        &self,
+        py: Python<'_>,
+        nonces: PyBuffer<u64>,
+        out: PyBuffer<u8>,
+        threads: usize,
+    ) -> PyResult<usize> {
+        let (out_ptr, out_len) = writable(&out)?;
+        if !nonces.is_c_contiguous() {
+            return Err(PyBufferError::new_err("nonces must be C-contiguous"));
+        }
+        let count = nonces.item_count();
+        if out_len < count * search::DIGEST_SIZE {
+            return Err(PyValueError::new_err(format!(
+                "out holds {} digests, {} nonces given",
+                out_len / search::DIGEST_SIZE,
+                count
+            )));
         }
-        0
+        let nonces_ptr = nonces.buf_ptr() as usize;
+        if nonces_ptr % std::mem::align_of::<u64>() != 0 {
+            return Err(PyBufferError::new_err("nonces must be 8-byte aligned"));
+        }
+        py.allow_threads(|| {
+            let nonces = unsafe { std::slice::from_raw_parts(nonces_ptr as *const u64, count) };
+            let out = unsafe {
+                std::slice::from_raw_parts_mut(out_ptr as *mut u8, count * search::DIGEST_SIZE)
+            };
+            search::hash_nonces(&self.base_data, nonces, out, threads)
+        });
+        Ok(count)
+    }
+}
+
+/// Address and length of a writable C-contiguous byte buffer
+fn writable(buffer: &PyBuffer<u8>) -> PyResult<(usize, usize)> {
+    if buffer.readonly() {
+        return Err(PyBufferError::new_err("out must be writable"));
+    }
+    if !buffer.is_c_contiguous() {
+        return Err(PyBufferError::new_err("out must be C-contiguous"));
     }
+    Ok((buffer.buf_ptr() as usize, buffer.len_bytes()))
 }
 
 #[pymodule]
 fn libducohasher(_py: Python, m: &Bound<PyModule>) -> PyResult<()> {
+    m.add("BACKEND", "cpu")?;
     m.add_class::<DUCOHasher>()?;
     Ok(())
 }
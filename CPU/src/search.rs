@@ -0,0 +1,156 @@
+//! DUCO-S1 nonce search on native threads, shared by the CPU and hybrid engines.
+//! Kept free of pyo3 so other crates can include it with `#[path]`.
+
+use sha1::{Digest, Sha1};
+use std::sync::atomic::{AtomicBool, AtomicU64, Ordering};
+use std::thread;
+use std::time::Instant;
+
+/// Nonces a thread claims at a time; also how often `stop` is checked
+pub const BLOCK_SIZE: u64 = 1 << 16;
+/// Size of one DUCO-S1 (SHA1) digest in batch output buffers
+pub const DIGEST_SIZE: usize = 20;
+/// Batches smaller than this per thread are not worth spawning for
+const MIN_BATCH_PER_THREAD: usize = 4096;
+
+/// Searches nonces start..end for expected_hash on `threads` threads
+/// (0 uses every allowed CPU). Returns the match and how many nonces were hashed.
+/// Stops early once `stop` is set by the caller or `deadline` passes,
+/// and sets `stop` when a match is found.
+pub fn search(
+    base_data: &[u8],
+    expected_hash: &[u8],
+    start: u64,
+    end: u64,
+    threads: usize,
+    stop: &AtomicBool,
+    deadline: Option<Instant>,
+) -> (Option<u64>, u64) {
+    let base_hasher = Sha1::new().chain_update(base_data);
+    let threads = resolve_threads(threads);
+
+    // Threads claim blocks in order so the search still roughly
+    // progresses from the start and stops shortly after a match.
+    let next = AtomicU64::new(start);
+    let found = AtomicU64::new(u64::MAX);
+    let hashed = AtomicU64::new(0);
+    let worker = || loop {
+        if stop.load(Ordering::Relaxed) || deadline.is_some_and(|d| Instant::now() >= d) {
+            break;
+        }
+        let block = next.fetch_add(BLOCK_SIZE, Ordering::Relaxed);
+        if block >= end {
+            break;
+        }
+        let stop_at = block.saturating_add(BLOCK_SIZE).min(end);
+        match scan(&base_hasher, expected_hash, block, stop_at) {
+            Some(nonce) => {
+                hashed.fetch_add(nonce - block + 1, Ordering::Relaxed);
+                found.fetch_min(nonce, Ordering::Relaxed);
+                stop.store(true, Ordering::Relaxed);
+                break;
+            }
+            None => {
+                hashed.fetch_add(stop_at - block, Ordering::Relaxed);
+            }
+        }
+    };
+
+    if threads == 1 {
+        worker();
+    } else {
+        thread::scope(|scope| {
+            for _ in 0..threads {
+                scope.spawn(&worker);
+            }
+        });
+    }
+
+    let nonce = match found.load(Ordering::Relaxed) {
+        u64::MAX => None,
+        nonce => Some(nonce),
+    };
+    (nonce, hashed.load(Ordering::Relaxed))
+}
+
+/// Hashes base + nonce for nonces in start..end, returns the first match
+pub fn scan(base_hasher: &Sha1, expected_hash: &[u8], start: u64, end: u64) -> Option<u64> {
+    let mut buffer = itoa::Buffer::new();
+
+    for nonce in start..end {
+        let mut hasher = base_hasher.clone();
+        let str = buffer.format(nonce);
+        hasher.update(str.as_bytes());
+
+        let mut output = [0u8; 20];
+        hasher.finalize_into((&mut output).into());
+
+        if &output[..] == expected_hash {
+            return Some(nonce);
+        }
+    }
+    None
+}
+
+/// Writes the digest of base + nonce for nonces start, start + 1, ...
+/// into `out`, one DIGEST_SIZE slot per nonce
+pub fn hash_range(base_data: &[u8], start: u64, out: &mut [u8], threads: usize) {
+    let base_hasher = Sha1::new().chain_update(base_data);
+    parallel(out, threads, |first, digests| {
+        let mut buffer = itoa::Buffer::new();
+        for (i, digest) in digests.chunks_exact_mut(DIGEST_SIZE).enumerate() {
+            digest_into(
+                &base_hasher,
+                &mut buffer,
+                start + (first + i) as u64,
+                digest,
+            );
+        }
+    });
+}
+
+/// Writes the digest of base + nonces[i] into slot i of `out`
+pub fn hash_nonces(base_data: &[u8], nonces: &[u64], out: &mut [u8], threads: usize) {
+    let base_hasher = Sha1::new().chain_update(base_data);
+    parallel(out, threads, |first, digests| {
+        let mut buffer = itoa::Buffer::new();
+        for (nonce, digest) in nonces[first..]
+            .iter()
+            .zip(digests.chunks_exact_mut(DIGEST_SIZE))
+        {
+            digest_into(&base_hasher, &mut buffer, *nonce, digest);
+        }
+    });
+}
+
+fn digest_into(base_hasher: &Sha1, buffer: &mut itoa::Buffer, nonce: u64, out: &mut [u8]) {
+    let mut hasher = base_hasher.clone();
+    hasher.update(buffer.format(nonce).as_bytes());
+    hasher.finalize_into(out.into());
+}
+
+fn resolve_threads(threads: usize) -> usize {
+    match threads {
+        0 => thread::available_parallelism().map_or(1, |n| n.get()),
+        n => n,
+    }
+}
+
+/// Splits `out` into one contiguous run of digest slots per thread and
+/// calls f(index of the first slot, slots) on each
+fn parallel(out: &mut [u8], threads: usize, f: impl Fn(usize, &mut [u8]) + Sync) {
+    let count = out.len() / DIGEST_SIZE;
+    let threads = resolve_threads(threads).min(count.div_ceil(MIN_BATCH_PER_THREAD));
+    if threads <= 1 {
+        f(0, out);
+        return;
+    }
+
+    let per_thread = count.div_ceil(threads);
+    let f = &f;
+    thread::scope(|scope| {
+        for (i, part) in out.chunks_mut(per_thread * DIGEST_SIZE).enumerate() {
+            scope.spawn(move || f(i * per_thread, part));
+        }
+    });
+}
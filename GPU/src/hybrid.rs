@@ -0,0 +1,161 @@
+// 混合引擎：同一进程里同时使用 CPU 线程和 OpenCL 设备
+// 小任务只交给 CPU（避免 kernel 启动和拷贝开销），大任务按实测速度拆分 nonce 区间：
+// CPU 从 0 开始搜索 [0, split)，设备搜索 [split, end)，任意一方找到后共享的 stop 让另一方停下
+use crate::opencl;
+use crate::search;
+use std::sync::atomic::AtomicBool;
+use std::thread;
+use std::time::Instant;
+
+// CPU 预计在这个时间内完成的任务不再拆分
+const SMALL_JOB_SECONDS: f64 = 0.05;
+// 运行时间太短的测量误差大，不计入速度
+const MIN_SAMPLE_SECONDS: f64 = 0.005;
+// 速度的指数平均系数
+const RATE_ALPHA: f64 = 0.3;
+// 还没有测量时的初始估计（H/s）
+const INITIAL_CPU_RATE: f64 = 2_000_000.0;
+const INITIAL_GPU_RATE: f64 = 20_000_000.0;
+
+#[derive(Default)]
+pub struct Stats {
+    pub cpu_jobs: u64,
+    pub split_jobs: u64,
+    pub cpu_found: u64,
+    pub gpu_found: u64,
+    pub cpu_hashes: u64,
+    pub gpu_hashes: u64,
+}
+
+pub struct Router {
+    pub cpu_threads: usize,
+    pub cpu_max_diff: u64,
+    pub cpu_rate: f64,
+    pub gpu_rate: f64,
+    pub gpu_ok: bool,
+    pub stats: Stats,
+}
+
+impl Router {
+    pub fn new(cpu_threads: usize, cpu_max_diff: u64) -> Self {
+        let threads = match cpu_threads {
+            0 => thread::available_parallelism().map_or(1, |n| n.get()),
+            n => n,
+        };
+        Self {
+            cpu_threads,
+            cpu_max_diff,
+            cpu_rate: INITIAL_CPU_RATE * threads as f64,
+            gpu_rate: INITIAL_GPU_RATE,
+            gpu_ok: true,
+            stats: Stats::default(),
+        }
+    }
+
+    /// 返回拆分点：[0, split) 给 CPU，[split, end) 给设备；split == end 表示只用 CPU
+    pub fn split(&self, diff: u64, end: u64) -> u64 {
+        if !self.gpu_ok || diff <= self.cpu_max_diff {
+            return end;
+        }
+        if end as f64 / self.cpu_rate < SMALL_JOB_SECONDS {
+            return end;
+        }
+        let share = self.cpu_rate / (self.cpu_rate + self.gpu_rate);
+        ((end as f64 * share) as u64).min(end)
+    }
+
+    pub fn record(rate: &mut f64, hashed: u64, seconds: f64) {
+        if seconds < MIN_SAMPLE_SECONDS || hashed == 0 {
+            return;
+        }
+        let sample = hashed as f64 / seconds;
+        *rate = (1.0 - RATE_ALPHA) * *rate + RATE_ALPHA * sample;
+    }
+}
+
+pub struct Outcome {
+    pub nonce: Option<u64>,
+    pub gpu_found: bool,
+    pub cpu_hashed: u64,
+    pub cpu_seconds: f64,
+    pub gpu_hashed: u64,
+    pub gpu_seconds: f64,
+    pub gpu_ok: bool,
+}
+
+/// CPU 在后台线程搜索 [0, split)，当前线程驱动设备搜索 [split, end)
+/// 超过 deadline 后两边都放弃
+pub fn run(
+    base_data: &[u8],
+    expected_hash: &[u8],
+    split: u64,
+    end: u64,
+    cpu_threads: usize,
+    chunk_size: u64,
+    device: &str,
+    deadline: Option<Instant>,
+) -> Outcome {
+    let stop = AtomicBool::new(false);
+
+    if split >= end {
+        let started = Instant::now();
+        let (nonce, hashed) = search::search(base_data, expected_hash, 0, end, cpu_threads, &stop, deadline);
+        return Outcome {
+            nonce,
+            gpu_found: false,
+            cpu_hashed: hashed,
+            cpu_seconds: started.elapsed().as_secs_f64(),
+            gpu_hashed: 0,
+            gpu_seconds: 0.0,
+            gpu_ok: true,
+        };
+    }
+
+    thread::scope(|scope| {
+        let stop = &stop;
+        let cpu = scope.spawn(move || {
+            let started = Instant::now();
+            let result = search::search(base_data, expected_hash, 0, split, cpu_threads, stop, deadline);
+            (result, started.elapsed().as_secs_f64())
+        });
+
+        let started = Instant::now();
+        let gpu = opencl::with_searcher(device, |gpu| {
+            gpu.search(base_data, expected_hash, split, end, chunk_size, stop, deadline)
+        });
+        let gpu_seconds = started.elapsed().as_secs_f64();
+        let ((cpu_nonce, cpu_hashed), cpu_seconds) = cpu.join().unwrap();
+
+        match gpu {
+            Some((gpu_nonce, gpu_hashed)) => Outcome {
+                // CPU 区间在前，两边都找到时取较小的 nonce，与单引擎结果一致
+                nonce: cpu_nonce.or(gpu_nonce),
+                gpu_found: cpu_nonce.is_none() && gpu_nonce.is_some(),
+                cpu_hashed,
+                cpu_seconds,
+                gpu_hashed,
+                gpu_seconds,
+                gpu_ok: true,
+            },
+            None => {
+                // 设备不可用：剩下的区间也交给 CPU
+                let (rest_nonce, rest_hashed) = match cpu_nonce {
+                    Some(_) => (None, 0),
+                    None => {
+                        let stop = AtomicBool::new(false);
+                        search::search(base_data, expected_hash, split, end, cpu_threads, &stop, deadline)
+                    }
+                };
+                Outcome {
+                    nonce: cpu_nonce.or(rest_nonce),
+                    gpu_found: false,
+                    cpu_hashed: cpu_hashed + rest_hashed,
+                    cpu_seconds: started.elapsed().as_secs_f64(),
+                    gpu_hashed: 0,
+                    gpu_seconds: 0.0,
+                    gpu_ok: false,
+                }
+            }
+        }
+    })
+}
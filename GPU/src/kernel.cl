@@ -166,3 +166,112 @@ __kernel void duco_brute(
         atomic_cmpxchg((__global volatile uint*)result, 0, (uint)tid);
     }
 }
+
+#ifdef NONCES_PER_ITEM
+// 特化 kernel：宿主按 -D BASE_LEN、NONCE_DIGITS、NONCES_PER_ITEM 编译，
+// 只用于 BASE_LEN + NONCE_DIGITS <= 55（消息加填充只占一个块）且同一次启动中
+// nonce 位数不变的批次。每个 work-item 只构造一次消息块，然后连续计算
+// NONCES_PER_ITEM 个 nonce，nonce 以十进制计数器的形式在块内原地加一
+#define MSG_LEN (BASE_LEN + NONCE_DIGITS)
+// 含 nonce 数字的第一个和最后一个字
+#define FIRST_WORD (BASE_LEN / 4)
+#define LAST_WORD ((MSG_LEN - 1) / 4)
+
+// 与 sha1_compress 相同，输入为 16 个大端字
+void sha1_compress_words(uint* state, const uint* m) {
+    uint w[80];
+    for (int i = 0; i < 16; ++i) w[i] = m[i];
+    for (int i = 16; i < 80; ++i) {
+        w[i] = rotl(w[i-3] ^ w[i-8] ^ w[i-14] ^ w[i-16], 1);
+    }
+
+    uint a = state[0], b = state[1], c = state[2], d = state[3], e = state[4];
+    for (int i = 0; i < 80; ++i) {
+        uint f, k;
+        if (i < 20) {
+            f = (b & c) | ((~b) & d);
+            k = 0x5A827999;
+        } else if (i < 40) {
+            f = b ^ c ^ d;
+            k = 0x6ED9EBA1;
+        } else if (i < 60) {
+            f = (b & c) | (b & d) | (c & d);
+            k = 0x8F1BBCDC;
+        } else {
+            f = b ^ c ^ d;
+            k = 0xCA62C1D6;
+        }
+        uint temp = rotl(a, 5) + f + e + k + w[i];
+        e = d;
+        d = c;
+        c = rotl(b, 30);
+        b = a;
+        a = temp;
+    }
+    state[0] += a;
+    state[1] += b;
+    state[2] += c;
+    state[3] += d;
+    state[4] += e;
+}
+
+uint load_word(const uchar* p) {
+    return ((uint)p[0] << 24) | ((uint)p[1] << 16) | ((uint)p[2] << 8) | p[3];
+}
+
+// result 保存找到的最小偏移（相对 start_nonce），0xFFFFFFFF 表示未找到
+__kernel void duco_brute_k(
+    __global const uchar* base_data,
+    __global const uchar* expected_hash,
+    ulong start_nonce,
+    ulong count,
+    __global uint* result
+) {
+    ulong first = (ulong)get_global_id(0) * NONCES_PER_ITEM;
+    if (first >= count || *result != 0xFFFFFFFF) return;
+
+    // 前缀、第一个 nonce 的数字、0x80 和长度
+    uchar block[64];
+    for (int i = 0; i < BASE_LEN; ++i) block[i] = base_data[i];
+    ulong n = start_nonce + first;
+    for (int i = MSG_LEN - 1; i >= BASE_LEN; --i) {
+        block[i] = '0' + (n % 10);
+        n /= 10;
+    }
+    block[MSG_LEN] = 0x80;
+    for (int i = MSG_LEN + 1; i < 64; ++i) block[i] = 0;
+    block[62] = ((MSG_LEN * 8) >> 8) & 0xFF;
+    block[63] = (MSG_LEN * 8) & 0xFF;
+
+    // 前缀所在的字每个 work-item 只转换一次
+    uint m[16];
+    for (int i = 0; i < 16; ++i) m[i] = load_word(block + i * 4);
+
+    uint expected[5];
+    for (int i = 0; i < 5; ++i) {
+        expected[i] = ((uint)expected_hash[i*4] << 24) | ((uint)expected_hash[i*4+1] << 16)
+                    | ((uint)expected_hash[i*4+2] << 8) | expected_hash[i*4+3];
+    }
+
+    for (uint j = 0; j < NONCES_PER_ITEM; ++j) {
+        if (first + j >= count) return;
+        uint state[5] = {0x67452301, 0xEFCDAB89, 0x98BADCFE, 0x10325476, 0xC3D2E1F0};
+        sha1_compress_words(state, m);
+        if (state[0] == expected[0] && state[1] == expected[1] && state[2] == expected[2]
+            && state[3] == expected[3] && state[4] == expected[4]) {
+            atomic_min(result, (uint)(first + j));
+            return;
+        }
+
+        // 十进制计数器加一，宿主保证批次内不会进位到新的一位
+        for (int i = MSG_LEN - 1; i >= BASE_LEN; --i) {
+            if (block[i] != '9') {
+                block[i]++;
+                break;
+            }
+            block[i] = '0';
+        }
+        for (int i = FIRST_WORD; i <= LAST_WORD; ++i) m[i] = load_word(block + i * 4);
+    }
+}
+#endif
@@ -1,6 +1,18 @@
+use pyo3::exceptions::PyRuntimeError;
 use pyo3::prelude::*;
-use ocl::{ProQue, Buffer};
-use std::slice;
+use std::collections::HashMap;
+use std::sync::atomic::AtomicBool;
+use std::sync::Mutex;
+use std::time::{Duration, Instant};
+
+mod hybrid;
+mod opencl;
+// CPU 引擎的搜索代码，混合模式下与设备同时运行
+#[path = "../../CPU/src/search.rs"]
+mod search;
+
+// 分块大小（手机友好）128K，可调（Adreno 友好）
+const DEFAULT_CHUNK_SIZE: u64 = 131_072;
 
 #[pyclass]
 #[derive(Clone)]
@@ -17,109 +29,145 @@ impl DUCOHasher {
         }
     }
 
+    /// 释放 GIL 后在 GPU 上搜索，其他 Python 线程在此期间可以继续运行
+    /// chunk_size: 每次 kernel 启动计算的 nonce 数量，可由校准模式调整
+    /// device: OpenCL 设备类型 "any"、"gpu"、"cpu" 或 "accelerator"
+    /// timeout: 超过这个秒数后放弃任务，同样返回 0
+    /// 返回 (nonce, 实际计算的哈希数)，未找到时 nonce 为 0
     #[allow(non_snake_case)]
-    pub fn DUCOS1(&self, expected_hash: &[u8], diff: u64, job_mul: u64) -> u64 {
+    #[pyo3(signature = (expected_hash, diff, job_mul, chunk_size=DEFAULT_CHUNK_SIZE, device="any", timeout=None))]
+    pub fn DUCOS1(&self, py: Python<'_>, expected_hash: &[u8], diff: u64, job_mul: u64, chunk_size: u64, device: &str, timeout: Option<f64>) -> (u64, u64) {
         let max_nonce = diff * job_mul;
         if max_nonce == 0 {
-            return 0;
+            return (0, 0);
         }
+        let stop = AtomicBool::new(false);
+        let deadline = deadline_after(timeout);
+        py.allow_threads(|| {
+            opencl::with_searcher(device, |gpu| {
+                gpu.search(&self.base_data, expected_hash, 0, max_nonce, chunk_size.max(1), &stop, deadline)
+            })
+        })
+        .map_or((0, 0), |(nonce, hashed)| (nonce.unwrap_or(0), hashed))
+    }
+}
 
-        let kernel_src = include_str!("kernel.cl");
+/// 混合引擎，每个挖矿进程一个实例，记录 CPU 和设备的实测速度用于拆分任务
+#[pyclass]
+struct HybridHasher {
+    router: Mutex<hybrid::Router>,
+    chunk_size: u64,
+    device: String,
+}
 
-        let pro_que = ProQue::builder()
-            .src(kernel_src)
-            .dims(1) // 占位，后面改
-            .build()
-            .ok();
+#[pymethods]
+impl HybridHasher {
+    /// cpu_threads: CPU 搜索线程数，0 表示全部 CPU
+    /// cpu_max_diff: 难度不超过这个值的任务只在 CPU 上计算
+    #[new]
+    #[pyo3(signature = (cpu_threads=1, chunk_size=DEFAULT_CHUNK_SIZE, device="any", cpu_max_diff=0))]
+    pub fn new(cpu_threads: usize, chunk_size: u64, device: &str, cpu_max_diff: u64) -> Self {
+        Self {
+            router: Mutex::new(hybrid::Router::new(cpu_threads, cpu_max_diff)),
+            chunk_size: chunk_size.max(1),
+            device: device.to_string(),
+        }
+    }
 
-        let mut pro_que = match pro_que {
-            Some(pq) => pq,
-            None => return 0,
+    /// 搜索 0..=diff*job_mul，与 CPU 引擎的范围一致，返回 (nonce, CPU 和设备实际计算的哈希数)
+    /// 未找到或超过 timeout 秒时 nonce 为 0
+    #[allow(non_snake_case)]
+    #[pyo3(signature = (base_data, expected_hash, diff, job_mul, timeout=None))]
+    pub fn DUCOS1(&self, py: Python<'_>, base_data: &[u8], expected_hash: &[u8], diff: u64, job_mul: u64, timeout: Option<f64>) -> (u64, u64) {
+        let end = diff.saturating_mul(job_mul).saturating_add(1);
+        let (split, cpu_threads) = {
+            let router = self.router.lock().unwrap();
+            (router.split(diff, end), router.cpu_threads)
         };
 
-        let queue = pro_que.queue().clone();
-
-        // 创建 buffers（复用）
-        let base_data_buf = Buffer::builder()
-            .queue(queue.clone())
-            .len(self.base_data.len())
-            .copy_host_slice(&self.base_data)
-            .build()
-            .unwrap();
-
-        let expected_hash_buf = Buffer::builder()
-            .queue(queue.clone())
-            .len(expected_hash.len())
-            .copy_host_slice(expected_hash)
-            .build()
-            .unwrap();
-
-        let result_buf = Buffer::builder()
-            .queue(queue.clone())
-            .len(1)
-            .build()
-            .unwrap();
-
-        // 分块大小（手机友好）
-        let chunk_size = 131_072; // 128K，可调（Adreno 友好）
-        let total = max_nonce;
-
-        let mut start_nonce = 0u64;
-
-        while start_nonce < total {
-            let batch_size = ((start_nonce + chunk_size) as u64)
-                .min(total)
-                .saturating_sub(start_nonce) as usize;
-
-            if batch_size == 0 {
-                break;
-            }
-
-            // 更新 ProQue 维度
-            pro_que.set_dims([batch_size]);
-
-            // 重置 result
-            let zero: u32 = 0;
-            result_buf.write(slice::from_ref(&zero)).enq().unwrap();
-
-            // 构建 kernel
-            let kernel = pro_que.kernel_builder("duco_brute")
-                .arg(&base_data_buf)
-                .arg(self.base_data.len() as u32)
-                .arg(&expected_hash_buf)
-                .arg(start_nonce)          // 传起始 nonce
-                .arg(batch_size as u64)    // 当前批次大小
-                .arg(&result_buf)
-                .build()
-                .unwrap();
-
-            // 执行这一批
-            unsafe {
-                if let Err(_) = kernel.enq() {
-                    // 如果失败（如超时），跳过这一批
-                    start_nonce += batch_size as u64;
-                    continue;
-                }
+        let deadline = deadline_after(timeout);
+        let outcome = py.allow_threads(|| {
+            hybrid::run(base_data, expected_hash, split, end, cpu_threads, self.chunk_size, &self.device, deadline)
+        });
+
+        let mut router = self.router.lock().unwrap();
+        router.gpu_ok = outcome.gpu_ok;
+        hybrid::Router::record(&mut router.cpu_rate, outcome.cpu_hashed, outcome.cpu_seconds);
+        hybrid::Router::record(&mut router.gpu_rate, outcome.gpu_hashed, outcome.gpu_seconds);
+        let stats = &mut router.stats;
+        if split >= end {
+            stats.cpu_jobs += 1;
+        } else {
+            stats.split_jobs += 1;
+        }
+        if outcome.nonce.is_some() {
+            if outcome.gpu_found {
+                stats.gpu_found += 1;
+            } else {
+                stats.cpu_found += 1;
             }
+        }
+        stats.cpu_hashes += outcome.cpu_hashed;
+        stats.gpu_hashes += outcome.gpu_hashed;
+        (outcome.nonce.unwrap_or(0), outcome.cpu_hashed + outcome.gpu_hashed)
+    }
 
-            // 读结果
-            let mut result: u32 = 0;
-            if result_buf.read(slice::from_mut(&mut result)).enq().is_ok() && result != 0 {
-                return u64::from(result);
-            }
+    /// 当前的速度估计和任务分配计数
+    pub fn stats(&self) -> HashMap<&'static str, f64> {
+        let router = self.router.lock().unwrap();
+        let stats = &router.stats;
+        HashMap::from([
+            ("cpu_rate", router.cpu_rate),
+            ("gpu_rate", router.gpu_rate),
+            ("gpu_ok", if router.gpu_ok { 1.0 } else { 0.0 }),
+            ("cpu_jobs", stats.cpu_jobs as f64),
+            ("split_jobs", stats.split_jobs as f64),
+            ("cpu_found", stats.cpu_found as f64),
+            ("gpu_found", stats.gpu_found as f64),
+            ("cpu_hashes", stats.cpu_hashes as f64),
+            ("gpu_hashes", stats.gpu_hashes as f64),
+        ])
+    }
+}
 
-            start_nonce += batch_size as u64;
+/// 在 device 上测试特化 kernel 的每个 work-item nonce 数（K）和 work-group 大小，
+/// 结果立即用于本进程之后的任务，返回 (设备名, K, work_group, H/s) 供调用方保存
+#[pyfunction]
+#[pyo3(signature = (device="any", chunk_size=DEFAULT_CHUNK_SIZE, trial_seconds=0.25))]
+fn tune_kernel(py: Python<'_>, device: &str, chunk_size: u64, trial_seconds: f64) -> PyResult<(String, u32, usize, f64)> {
+    let trial = Duration::try_from_secs_f64(trial_seconds.max(0.0)).unwrap_or(Duration::ZERO);
+    py.allow_threads(|| {
+        opencl::with_searcher(device, |gpu| {
+            gpu.tune(chunk_size, trial)
+                .map(|(params, rate)| (gpu.name(), params.nonces_per_item, params.work_group, rate))
+        })
+    })
+    .flatten()
+    .ok_or_else(|| PyRuntimeError::new_err(format!("no OpenCL device \"{}\" that builds the specialised kernel", device)))
+}
 
-            // 可选：小休一下，防止过热
-            // std::thread::sleep(std::time::Duration::from_micros(100));
-        }
+/// 使用之前保存的调优结果，设备不可用时返回 False
+#[pyfunction]
+fn set_kernel(device: &str, nonces_per_item: u32, work_group: usize) -> bool {
+    opencl::with_searcher(device, |gpu| {
+        gpu.params = opencl::KernelParams { nonces_per_item: nonces_per_item.max(1), work_group };
+    })
+    .is_some()
+}
 
-        0
-    }
+// 无效或过大的 timeout 视为不限时
+fn deadline_after(timeout: Option<f64>) -> Option<Instant> {
+    timeout
+        .and_then(|t| Duration::try_from_secs_f64(t.max(0.0)).ok())
+        .and_then(|t| Instant::now().checked_add(t))
 }
 
 #[pymodule]
 fn libducohasher(_py: Python, m: &Bound<PyModule>) -> PyResult<()> {
+    m.add("BACKEND", "gpu")?;
     m.add_class::<DUCOHasher>()?;
+    m.add_class::<HybridHasher>()?;
+    m.add_function(wrap_pyfunction!(tune_kernel, m)?)?;
+    m.add_function(wrap_pyfunction!(set_kernel, m)?)?;
     Ok(())
 }
@@ -0,0 +1,346 @@
+// OpenCL 搜索：按设备缓存 ProQue，避免每个任务都重新编译 kernel
+// 消息能放进一个 SHA1 块时使用按任务特化的 duco_brute_k，其余情况使用通用的 duco_brute
+use ocl::flags::DeviceType;
+use ocl::{Buffer, Device, Kernel, Platform, ProQue, Program};
+use std::collections::HashMap;
+use std::slice;
+use std::sync::atomic::{AtomicBool, Ordering};
+use std::sync::Mutex;
+use std::time::{Duration, Instant};
+
+// 当前进程使用的设备及其 ProQue
+static SEARCHER: Mutex<Option<(String, GpuSearcher)>> = Mutex::new(None);
+
+// 前缀加 nonce 不超过这个长度时，消息、0x80 和长度只占一个块
+const SINGLE_BLOCK_LEN: usize = 55;
+const NOT_FOUND: u32 = u32::MAX;
+// 自动调优的候选值，work_group 为 0 表示交给驱动决定
+const TUNE_NONCES_PER_ITEM: [u32; 6] = [1, 2, 4, 8, 16, 32];
+const TUNE_WORK_GROUPS: [usize; 5] = [0, 32, 64, 128, 256];
+// 调优用与任务相同长度的前缀（40 位 SHA1 十六进制）和 8 位 nonce
+const TUNE_BASE: &[u8; 40] = b"da39a3ee5e6b4b0d3255bfef95601890afd80709";
+const TUNE_START: u64 = 10_000_000;
+const TUNE_MAX_CHUNK: u64 = 1 << 24;
+
+#[derive(Clone, Copy)]
+pub struct KernelParams {
+    pub nonces_per_item: u32,
+    pub work_group: usize,
+}
+
+// 没有调优结果时使用
+impl Default for KernelParams {
+    fn default() -> Self {
+        Self { nonces_per_item: 4, work_group: 0 }
+    }
+}
+
+pub struct GpuSearcher {
+    pro_que: ProQue,
+    pub params: KernelParams,
+    // (前缀长度, nonce 位数, 每个 work-item 的 nonce 数) -> 特化后的程序
+    programs: HashMap<(usize, usize, u32), Program>,
+}
+
+fn digits(n: u64) -> usize {
+    n.checked_ilog10().map_or(1, |d| d as usize + 1)
+}
+
+/// device: "any"（第一个平台的默认设备，与旧版本一致）、"gpu"、"cpu" 或 "accelerator"
+/// 选择 "cpu" 可以在没有显卡的机器上用 CPU 的 OpenCL 实现（如 pocl）测试
+fn pick_device(device: &str) -> Option<(Platform, Device)> {
+    let wanted = match device {
+        "gpu" => DeviceType::GPU,
+        "cpu" => DeviceType::CPU,
+        "accelerator" => DeviceType::ACCELERATOR,
+        _ => return None,
+    };
+    for platform in Platform::list() {
+        if let Ok(devices) = Device::list(platform, Some(wanted)) {
+            if let Some(found) = devices.first() {
+                return Some((platform, *found));
+            }
+        }
+    }
+    None
+}
+
+impl GpuSearcher {
+    pub fn new(device: &str) -> Option<Self> {
+        let mut builder = ProQue::builder();
+        builder.src(include_str!("kernel.cl")).dims(1); // 占位，后面改
+        if device != "any" {
+            let (platform, found) = pick_device(device)?;
+            builder.platform(platform).device(found);
+        }
+        builder.build().ok().map(|pro_que| Self {
+            pro_que,
+            params: KernelParams::default(),
+            programs: HashMap::new(),
+        })
+    }
+
+    pub fn name(&self) -> String {
+        self.pro_que.device().name().unwrap_or_default()
+    }
+
+    // 每种前缀长度、nonce 位数和 K 只编译一次
+    fn program(&mut self, base_len: usize, nonce_digits: usize, nonces_per_item: u32) -> Option<Program> {
+        let key = (base_len, nonce_digits, nonces_per_item);
+        if !self.programs.contains_key(&key) {
+            let program = Program::builder()
+                .src(include_str!("kernel.cl"))
+                .devices(self.pro_que.device())
+                .cmplr_opt(format!(
+                    "-D BASE_LEN={} -D NONCE_DIGITS={} -D NONCES_PER_ITEM={}",
+                    base_len, nonce_digits, nonces_per_item
+                ))
+                .build(self.pro_que.context())
+                .ok()?;
+            self.programs.insert(key, program);
+        }
+        self.programs.get(&key).cloned()
+    }
+
+    /// 用 duco_brute_k 搜索 start..end，批次在 nonce 位数变化处切开
+    /// 还没计算任何 nonce 就无法编译或启动时返回 None，由调用方改用通用 kernel
+    fn search_specialised(
+        &mut self,
+        base_data: &[u8],
+        expected_hash: &[u8],
+        start: u64,
+        end: u64,
+        chunk_size: u64,
+        params: KernelParams,
+        stop: &AtomicBool,
+        deadline: Option<Instant>,
+    ) -> Option<(Option<u64>, u64)> {
+        let queue = self.pro_que.queue().clone();
+        let base_data_buf = Buffer::<u8>::builder()
+            .queue(queue.clone())
+            .len(base_data.len())
+            .copy_host_slice(base_data)
+            .build()
+            .ok()?;
+        let expected_hash_buf = Buffer::<u8>::builder()
+            .queue(queue.clone())
+            .len(expected_hash.len())
+            .copy_host_slice(expected_hash)
+            .build()
+            .ok()?;
+        let result_buf = Buffer::<u32>::builder().queue(queue.clone()).len(1).build().ok()?;
+
+        let nonces_per_item = params.nonces_per_item.max(1);
+        // 结果是批次内的 u32 偏移
+        let chunk_size = chunk_size.clamp(1, u64::from(NOT_FOUND));
+        let mut start_nonce = start;
+        let mut hashed = 0u64;
+
+        while start_nonce < end && !stop.load(Ordering::Relaxed) {
+            if deadline.is_some_and(|d| Instant::now() >= d) {
+                break;
+            }
+            let nonce_digits = digits(start_nonce);
+            let next_digit = 10u64.checked_pow(nonce_digits as u32).unwrap_or(u64::MAX);
+            let batch_end = start_nonce.saturating_add(chunk_size).min(end).min(next_digit);
+            let count = batch_end - start_nonce;
+
+            let program = match self.program(base_data.len(), nonce_digits, nonces_per_item) {
+                Some(program) => program,
+                None if hashed == 0 => return None,
+                None => break,
+            };
+            let items = count.div_ceil(u64::from(nonces_per_item)) as usize;
+            let mut builder = Kernel::builder();
+            builder.program(&program).name("duco_brute_k").queue(queue.clone());
+            if params.work_group > 0 {
+                builder
+                    .global_work_size(items.div_ceil(params.work_group) * params.work_group)
+                    .local_work_size(params.work_group);
+            } else {
+                builder.global_work_size(items);
+            }
+            builder
+                .arg(&base_data_buf)
+                .arg(&expected_hash_buf)
+                .arg(start_nonce)
+                .arg(count)
+                .arg(&result_buf);
+            let kernel = match builder.build() {
+                Ok(kernel) => kernel,
+                Err(_) if hashed == 0 => return None,
+                Err(_) => break,
+            };
+
+            result_buf.write(slice::from_ref(&NOT_FOUND)).enq().ok()?;
+            unsafe {
+                if kernel.enq().is_err() {
+                    // 与通用 kernel 一样跳过失败的批次
+                    start_nonce = batch_end;
+                    continue;
+                }
+            }
+
+            let mut result = NOT_FOUND;
+            if result_buf.read(slice::from_mut(&mut result)).enq().is_ok() && result != NOT_FOUND {
+                stop.store(true, Ordering::Relaxed);
+                let offset = u64::from(result);
+                return Some((Some(start_nonce + offset), hashed + offset + 1));
+            }
+
+            start_nonce = batch_end;
+            hashed += count;
+        }
+        Some((None, hashed))
+    }
+
+    /// 在本设备上尝试每种 K 和 work-group 大小，每种先运行一次（包含编译）再计时 trial，
+    /// 采用最快的组合并返回它和速度（H/s）
+    pub fn tune(&mut self, chunk_size: u64, trial: Duration) -> Option<(KernelParams, f64)> {
+        let max_work_group = self.pro_que.device().max_wg_size().unwrap_or(0);
+        let chunk_size = chunk_size.clamp(1, TUNE_MAX_CHUNK);
+        let (start, end) = (TUNE_START, TUNE_START + chunk_size);
+        let expected = [0u8; 20];
+        let stop = AtomicBool::new(false);
+        let mut best: Option<(KernelParams, f64)> = None;
+
+        for &nonces_per_item in TUNE_NONCES_PER_ITEM.iter() {
+            for &work_group in TUNE_WORK_GROUPS.iter() {
+                if work_group > max_work_group {
+                    continue;
+                }
+                let params = KernelParams { nonces_per_item, work_group };
+                if self
+                    .search_specialised(TUNE_BASE, &expected, start, end, chunk_size, params, &stop, None)
+                    .is_none()
+                {
+                    continue;
+                }
+                let started = Instant::now();
+                let mut hashed = 0u64;
+                while started.elapsed() < trial || hashed == 0 {
+                    match self.search_specialised(TUNE_BASE, &expected, start, end, chunk_size, params, &stop, None) {
+                        Some((_, n)) if n > 0 => hashed += n,
+                        _ => break,
+                    }
+                }
+                let rate = hashed as f64 / started.elapsed().as_secs_f64();
+                if best.map_or(true, |(_, best_rate)| rate > best_rate) {
+                    best = Some((params, rate));
+                }
+            }
+        }
+        if let Some((params, _)) = best {
+            self.params = params;
+        }
+        best
+    }
+
+    /// 在 start..end 中搜索，返回找到的 nonce 和已计算的 nonce 数量
+    /// 每批之间检查 stop 和 deadline，找到时设置 stop，让同时运行的 CPU 线程也停下
+    pub fn search(
+        &mut self,
+        base_data: &[u8],
+        expected_hash: &[u8],
+        start: u64,
+        end: u64,
+        chunk_size: u64,
+        stop: &AtomicBool,
+        deadline: Option<Instant>,
+    ) -> (Option<u64>, u64) {
+        if start < end && base_data.len() + digits(end - 1) <= SINGLE_BLOCK_LEN {
+            let params = self.params;
+            if let Some(found) =
+                self.search_specialised(base_data, expected_hash, start, end, chunk_size, params, stop, deadline)
+            {
+                return found;
+            }
+        }
+
+        let queue = self.pro_que.queue().clone();
+
+        let base_data_buf = Buffer::builder()
+            .queue(queue.clone())
+            .len(base_data.len())
+            .copy_host_slice(base_data)
+            .build()
+            .unwrap();
+
+        let expected_hash_buf = Buffer::builder()
+            .queue(queue.clone())
+            .len(expected_hash.len())
+            .copy_host_slice(expected_hash)
+            .build()
+            .unwrap();
+
+        let result_buf = Buffer::builder()
+            .queue(queue.clone())
+            .len(1)
+            .build()
+            .unwrap();
+
+        let mut start_nonce = start;
+        let mut hashed = 0u64;
+
+        while start_nonce < end && !stop.load(Ordering::Relaxed) {
+            if deadline.is_some_and(|d| Instant::now() >= d) {
+                break;
+            }
+            let batch_size = start_nonce.saturating_add(chunk_size)
+                .min(end)
+                .saturating_sub(start_nonce) as usize;
+
+            if batch_size == 0 {
+                break;
+            }
+
+            // 更新 ProQue 维度
+            self.pro_que.set_dims([batch_size]);
+
+            // 重置 result
+            let zero: u32 = 0;
+            result_buf.write(slice::from_ref(&zero)).enq().unwrap();
+
+            // 构建 kernel
+            let kernel = self.pro_que.kernel_builder("duco_brute")
+                .arg(&base_data_buf)
+                .arg(base_data.len() as u32)
+                .arg(&expected_hash_buf)
+                .arg(start_nonce)          // 传起始 nonce
+                .arg(batch_size as u64)    // 当前批次大小
+                .arg(&result_buf)
+                .build()
+                .unwrap();
+
+            // 执行这一批
+            unsafe {
+                if let Err(_) = kernel.enq() {
+                    // 如果失败（如超时），跳过这一批
+                    start_nonce += batch_size as u64;
+                    continue;
+                }
+            }
+
+            // 读结果
+            let mut result: u32 = 0;
+            if result_buf.read(slice::from_mut(&mut result)).enq().is_ok() && result != 0 {
+                stop.store(true, Ordering::Relaxed);
+                return (Some(u64::from(result)), hashed + u64::from(result) - start_nonce + 1);
+            }
+
+            start_nonce += batch_size as u64;
+            hashed += batch_size as u64;
+        }
+
+        (None, hashed)
+    }
+}
+
+/// 用当前进程缓存的设备执行 f，设备不可用时返回 None
+pub fn with_searcher<R>(device: &str, f: impl FnOnce(&mut GpuSearcher) -> R) -> Option<R> {
+    let mut cached = SEARCHER.lock().unwrap_or_else(|e| e.into_inner());
+    if cached.as_ref().map_or(true, |(name, _)| name != device) {
+        *cached = GpuSearcher::new(device).map(|searcher| (device.to_string(), searcher));
+    }
+    cached.as_mut().map(|(_, searcher)| f(searcher))
+}
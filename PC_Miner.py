@@ -7,23 +7,26 @@ Duino-Coin Team & Community 2019-2025
 """
 
 from time import time, sleep, strptime, ctime, time_ns
-from socket import socket
+from socket import socket, gethostname
+from socket import timeout as socket_timeout
 
 from multiprocessing import cpu_count, current_process
-from multiprocessing import Process, Manager
-from threading import Thread, Lock
+from multiprocessing import Process, Queue, Array, Event, Value
+from multiprocessing.util import Finalize
+from threading import Thread, Lock, Condition, main_thread
 from datetime import datetime
-from random import randint
+from random import randint, uniform
 
 from os import execl, mkdir, _exit
 from os import name as osname
 from os import system as ossystem 
-from subprocess import Popen, check_call, PIPE
+from subprocess import Popen, check_call, PIPE, DEVNULL
 import pip
 import sys
 import base64 as b64
 import os
 import json
+import hashlib
 import urllib.parse
 
 from pathlib import Path
@@ -33,21 +36,37 @@ from platform import machine as osprocessor
 from platform import python_version_tuple
 from platform import python_version
 
-from signal import SIGINT, signal
+from signal import SIGINT, SIGTERM, SIG_IGN, signal
 from locale import getdefaultlocale
 from configparser import ConfigParser
+from collections import namedtuple
+from heapq import heappush, heappop
+from itertools import count
+from queue import Empty
+from statistics import median
+from math import ceil, exp
 
 import io
+import argparse
+
+from job_capture import JobCapture, percentile
+from miner_status import StatusFile
+import fleet_protocol
 
 try:
     import libducohasher
 except ImportError as err:
     print(f"无法导入 libducohasher! 你是否没有使用Rust编译程序? 如果它已经编译完成，请将release/文件夹里的所有文件全都放置到和脚本同目录的位置.\n错误信息: {err}")
-    print("程序退出.")
-    exit(1)
+    print("改用纯 Python 后备引擎（pyducohasher），速度远低于原生引擎.")
+    import pyducohasher as libducohasher
 
 debug = "n"
 running_on_rpi = False
+profiler = None
+hardware = None
+status_path = None
+fleet = None
+renderer = None
 configparser = ConfigParser()
 printlock = Lock()
 
@@ -77,11 +96,16 @@ def handler(signal_received, frame):
         os.system(
             'echo 1 | sudo tee /sys/class/leds/led1/brightness >/dev/null 2>&1')
 
-    if sys.platform == "win32":
-        _exit(0)
-    else: 
-        Popen("kill $(ps aux | grep PC_Miner | awk '{print $2}')",
-              shell=True, stdout=PIPE)
+    if current_process().name == "MainProcess":
+        if fleet:
+            fleet.stop()
+        if status_path:
+            try:
+                os.remove(status_path)
+            except OSError:
+                pass
+        sys.stdout.flush()
+    _exit(0)
 
 
 def debug_output(text: str):
@@ -155,12 +179,68 @@ class Settings:
     TRANSLATIONS_FILE = "/Translations.json"
     SETTINGS_FILE = "/Settings.cfg"
     TEMP_FOLDER = "Temp"
+    CAPTURE_DIR = "/Captures"
+    PROFILE_DIR = "/Profiles"
+    STATUS_DIR = "/Status"
+    STATUS_FILE = "y"
 
     SOC_TIMEOUT = 10
     REPORT_TIME = 300
     DONATE_LVL = 0
     RASPI_LEDS = "y"
     RASPI_CPU_IOT = "y"
+    CAPTURE_JOBS = "n"
+    AFFINITY = "none"
+    JOB_MUL = 100
+    NATIVE_THREADS = 1
+    GPU_CHUNK = 0
+    HYBRID = "n"
+    JOB_TIMEOUT = 120
+    MAX_RANGE = 0
+    DIFF_TIERS = ("LOW", "MEDIUM", "NET")
+    AUTO_DIFF = "n"
+    SHARE_TIME_BAND = "5-40"
+    TIER_MIN_JOBS = 8
+    OPENCL_DEVICE = "any"
+    HYBRID_CPU_DIFF = 0
+    CALIBRATION_SECTION = "Calibration "
+    KERNEL_SECTION = "Kernel "
+    KERNEL_TUNE_TIMEOUT = 120
+    # Nonces per work-item and work-group size (0 lets the driver
+    # pick) of the specialised kernel when tuning fails
+    KERNEL_DEFAULT = (4, 0)
+    STATS_SLOTS = 256
+    EWMA_TIME = 30
+    HASHRATE_WINDOW = 60
+    SESSION_SECTION = "Session "
+    SHARE_LINES = "auto"
+    SHARE_LINES_MAX = 16
+    CONSOLE_REFRESH = 0.1
+    TITLE_REFRESH = 1
+    START_STAGGER = 0.1
+    HEARTBEAT_TIMEOUT = 60
+    RESTART_BACKOFF = 1
+    RESTART_BACKOFF_MAX = 60
+    RESTART_RESET_TIME = 300
+    STOP_TIMEOUT = 2
+    RECONNECT_BACKOFF = 0.5
+    RECONNECT_BACKOFF_MAX = 30
+    SOCKET_RETRIES = 3
+    AGENT_STATS_TIME = 5
+    SUMMARY_TIME = 10
+    RPI_TEMPERATURE = "/sys/class/thermal/thermal_zone0/temp"
+    RPI_LEDS = {"green": "/sys/class/leds/led0/brightness",
+                "red": "/sys/class/leds/led1/brightness"}
+    BLINK_TIME = 0.1
+    TEMPERATURE_TIME = 5
+    GOVERNOR = "n"
+    TARGET_TEMP = 80
+    POWER_BUDGET = 0
+    SYSFS_THERMAL = "/sys/class/thermal"
+    SYSFS_POWERCAP = "/sys/class/powercap"
+    SYSFS_CPU = "/sys/devices/system"
+    PROFILE_INTERVAL = 0.005
+    PROFILE_DUMP_TIME = 30
     disable_title = False
 
     try:
@@ -190,10 +270,14 @@ def title(title: str):
         if osname == 'nt':
             """
             Changing the title in Windows' cmd
-            is easy - just use the built-in
-            title command
+            is easy - the console API sets it
+            without starting a title command
             """
-            ossystem('title ' + title)
+            try:
+                import ctypes
+                ctypes.windll.kernel32.SetConsoleTitleW(title)
+            except Exception:
+                ossystem('title ' + title)
         else:
             """
             Most *nix terminals use
@@ -214,19 +298,109 @@ class Algorithms:
     For more info about the implementation refer to the Duino whitepaper:
     https://github.com/revoxhere/duino-coin/blob/gh-pages/assets/whitepaper.pdf
     """
+    BACKEND = getattr(libducohasher, "BACKEND", "cpu")
+    engine_args = {}
+    hybrid = None
+
+    def tuning_args(tuning: dict) -> dict:
+        """
+        Keyword arguments for the loaded backend's DUCOS1
+        """
+        if Algorithms.BACKEND == "gpu":
+            args = {}
+            if tuning.get("gpu_chunk"):
+                args["chunk_size"] = int(tuning["gpu_chunk"])
+            if tuning.get("opencl_device", "any") != "any":
+                args["device"] = tuning["opencl_device"]
+            return args
+        return {"threads": int(tuning.get("native_threads", 1))}
+
+    def job_limits(user_settings) -> dict:
+        """
+        Deadline for DUCOS1 from job_timeout (seconds, 0 = none)
+        """
+        if float(user_settings["job_timeout"]) > 0:
+            return {"timeout": float(user_settings["job_timeout"])}
+        return {}
+
+    def search_range(diff: int, job_mul: int, max_range: int) -> tuple:
+        """
+        (diff, job_mul) to hand the engine so its diff * job_mul + 1
+        nonces stay within max_range (0 = no cap). Engines only use the
+        product, so a diff above the cap is lowered to fit. Jobs whose
+        nonce lies beyond it are abandoned
+        """
+        if max_range <= 0 or diff * job_mul + 1 <= max_range:
+            return diff, job_mul
+        if diff + 1 > max_range:
+            return max_range - 1, 1
+        return diff, (max_range - 1) // diff
+
+    def check_nonce(last_h: str, exp_h: str, nonce: int) -> bool:
+        return hashlib.sha1(
+            f"{last_h}{nonce}".encode("ascii")).hexdigest() == exp_h
+
+    def start_kernel(tuning: dict):
+        """
+        Applies the saved OpenCL kernel tuning in this process
+        """
+        if tuning.get("kernel") and hasattr(libducohasher, "set_kernel"):
+            libducohasher.set_kernel(tuning.get("opencl_device", "any"),
+                                     *tuning["kernel"])
+
+    def start_hybrid(tuning: dict) -> bool:
+        """
+        Creates this worker's CPU+GPU engine. It keeps measured
+        throughput across jobs, so there is one per process.
+        Returns False when the loaded build has no hybrid engine
+        """
+        if not hasattr(libducohasher, "HybridHasher"):
+            return False
+        Algorithms.hybrid = libducohasher.HybridHasher(
+            int(tuning.get("native_threads", 1)),
+            int(tuning.get("gpu_chunk") or 131072),
+            tuning.get("opencl_device", "any"),
+            int(tuning.get("hybrid_cpu_diff", 0)))
+        return True
+
+    def hybrid_summary() -> str:
+        stats = Algorithms.hybrid.stats()
+        return (f"Hybrid engine: CPU {get_prefix('H/s', stats['cpu_rate'], 2)},"
+                + f" GPU {get_prefix('H/s', stats['gpu_rate'], 2)}"
+                + ("" if stats["gpu_ok"] else " (device unavailable)")
+                + f", {int(stats['cpu_jobs'])} CPU-only jobs,"
+                + f" {int(stats['split_jobs'])} split jobs"
+                + f" ({int(stats['cpu_found'])} found on CPU,"
+                + f" {int(stats['gpu_found'])} on GPU)")
+
     def DUCOS1(last_h: str, exp_h: str, diff: int, eff: int):
         time_start = time_ns()
 
-        hasher = libducohasher.DUCOHasher(bytes(last_h, encoding='ascii'))
-        nonce = hasher.DUCOS1(
-            bytes(bytearray.fromhex(exp_h)), diff, int(eff))
+        if profiler:
+            profiler.in_native = True
+        # Engines return how many nonces they actually hashed, so a job
+        # abandoned on timeout only counts the part that was searched
+        if Algorithms.hybrid:
+            nonce, hashes = Algorithms.hybrid.DUCOS1(
+                bytes(last_h, encoding='ascii'),
+                bytes(bytearray.fromhex(exp_h)), diff, int(eff),
+                Algorithms.engine_args.get("timeout"))
+        else:
+            hasher = libducohasher.DUCOHasher(bytes(last_h, encoding='ascii'))
+            nonce, hashes = hasher.DUCOS1(
+                bytes(bytearray.fromhex(exp_h)), diff, int(eff),
+                **Algorithms.engine_args)
+        tried = min(hashes, diff * int(eff) + 1)
 
         time_elapsed = time_ns() - time_start
+        if profiler:
+            profiler.in_native = False
+            profiler.native_ns += time_elapsed
         if time_elapsed > 0:
-            hashrate = 1e9 * nonce / time_elapsed
+            hashrate = 1e9 * hashes / time_elapsed
         else:
-            return [nonce,0]
-        return [nonce, hashrate]
+            return [nonce, 0, tried]
+        return [nonce, hashrate, tried]
 
 
 
@@ -245,17 +419,59 @@ class Client:
         return sent
 
     def recv(limit: int = 128):
-        data = s.recv(limit).decode(Settings.ENCODING).rstrip("\n")
-        return data
+        data = s.recv(limit)
+        if not data:
+            raise ConnectionResetError("connection closed by the node")
+        return data.decode(Settings.ENCODING).rstrip("\n")
+
+    def drain():
+        """
+        Drops whatever the node already sent, so a garbled reply
+        doesn't shift every following one
+        """
+        s.settimeout(0)
+        try:
+            while s.recv(4096):
+                pass
+        except OSError:
+            pass
+        s.settimeout(Settings.SOC_TIMEOUT)
 
-    def fetch_pool(retry_count=1):
+    def classify(error: Exception) -> str:
+        """
+        timeout: the node didn't answer within SOC_TIMEOUT
+        disconnect: the connection is gone
+        parse: a reply that doesn't fit the protocol, the
+        connection itself still works
+        """
+        if isinstance(error, socket_timeout):
+            return "timeout"
+        if isinstance(error, OSError):
+            return "disconnect"
+        if isinstance(error, (ValueError, IndexError)):
+            return "parse"
+        return "error"
+
+    def backoff(attempt: int) -> float:
         """
-        Fetches the best pool from the /getPool API endpoint
+        Jittered exponential delay, so workers that lost the same
+        node don't all reconnect at the same moment
+        """
+        return uniform(0.5, 1) * min(Settings.RECONNECT_BACKOFF * 2 ** attempt,
+                                     Settings.RECONNECT_BACKOFF_MAX)
+
+    def fetch_pool(retry_count=1, heartbeat=None, id: int = 0):
+        """
+        Fetches the best pool from the /getPool API endpoint.
+        A worker passes its heartbeat so the retry waits, which grow
+        to two minutes, don't look like a hang to the supervisor
         """
 
         while True:
             if retry_count > 60:
                 retry_count = 60
+            if heartbeat is not None:
+                heartbeat[id] = time()
 
             try:
                 pretty_print(get_string("connection_search"),
@@ -290,10 +506,1416 @@ class Client:
                     pretty_print(get_string("node_picker_error")
                                  + f"{retry_count*2}s {Style.RESET_ALL}({e})",
                                  "error", "net0")
-            sleep(retry_count * 2)
+            until = time() + retry_count * 2
+            while True:
+                if heartbeat is not None:
+                    heartbeat[id] = time()
+                left = until - time()
+                if left <= 0:
+                    break
+                sleep(min(left, Settings.HEARTBEAT_TIMEOUT / 4))
             retry_count += 1
 
 
+class Profiler:
+    """
+    Sampling profiler running as a thread inside a mining worker.
+    Every interval it records the main thread's stack; samples taken
+    while libducohasher is hashing get a native leaf frame.
+    Results are written as collapsed stacks (flamegraph.pl, speedscope)
+    """
+    NETWORK_CALLS = ("Client.recv", "Client.send", "Client.connect")
+
+    def __init__(self, id: int, interval: float = Settings.PROFILE_INTERVAL):
+        self.id = id
+        self.interval = interval
+        self.stacks = {}
+        self.samples = {"native": 0, "network": 0, "python": 0}
+        self.native_ns = 0
+        self.in_native = False
+        self.start_ns = time_ns()
+        self.path = (Settings.DATA_DIR + Settings.PROFILE_DIR
+                     + f"/cpu{id}")
+
+    def start(self):
+        """
+        Samples in a thread of its own. Besides every PROFILE_DUMP_TIME,
+        results are written when the worker returns and when the
+        supervisor's SIGTERM arrives
+        """
+        Finalize(self, self.dump, exitpriority=0)
+        try:
+            from signal import SIG_BLOCK, pthread_sigmask, sigwait
+        except ImportError:
+            # Windows terminates without a signal, only the periodic
+            # dumps are kept there
+            pass
+        else:
+            # Blocked here before any native thread starts, so only
+            # the waiting thread takes it: the main thread may be in a
+            # native search that never runs Python signal handlers
+            pthread_sigmask(SIG_BLOCK, {SIGTERM})
+            Thread(target=self._dump_on_terminate, args=[sigwait],
+                   daemon=True).start()
+        Thread(target=self._sample_loop, daemon=True).start()
+
+    def _dump_on_terminate(self, sigwait):
+        sigwait({SIGTERM})
+        self.dump()
+        _exit(0)
+
+    def _sample_loop(self):
+        main_id = main_thread().ident
+        last_dump = time()
+        while True:
+            sleep(self.interval)
+            frame = sys._current_frames().get(main_id)
+            if frame is not None:
+                self._record(frame)
+            if time() - last_dump >= Settings.PROFILE_DUMP_TIME:
+                self.dump()
+                last_dump = time()
+
+    def _record(self, frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            name = getattr(code, "co_qualname", code.co_name)
+            module = Path(code.co_filename).stem
+            if module != "PC_Miner":
+                name = module + "." + name
+            names.append(name)
+            frame = frame.f_back
+        names.reverse()
+
+        if self.in_native:
+            names.append("libducohasher.DUCOS1")
+            self.samples["native"] += 1
+        elif any(call in names for call in Profiler.NETWORK_CALLS):
+            self.samples["network"] += 1
+        else:
+            self.samples["python"] += 1
+
+        stack = ";".join(names)
+        self.stacks[stack] = self.stacks.get(stack, 0) + 1
+
+    def summary(self) -> dict:
+        total = max(sum(self.samples.values()), 1)
+        wall_ns = max(time_ns() - self.start_ns, 1)
+        python = self.samples["python"]
+        return {
+            "worker": self.id,
+            "samples": total,
+            "native_pct": round(100 * self.samples["native"] / total, 2),
+            "network_pct": round(100 * self.samples["network"] / total, 2),
+            "python_pct": round(100 * python / total, 2),
+            "native_to_python": round(
+                self.samples["native"] / python, 2) if python else None,
+            "native_time_s": round(self.native_ns / 1e9, 3),
+            "wall_time_s": round(wall_ns / 1e9, 3)}
+
+    def dump(self):
+        """
+        Rewrites this worker's .folded stacks and .json summary
+        """
+        stacks = list(self.stacks.items())
+        with open(self.path + ".folded", "w") as f:
+            for stack, n in stacks:
+                f.write(f"{stack} {n}\n")
+        with open(self.path + ".json", "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+
+LogicalCPU = namedtuple("LogicalCPU",
+                        ["cpu", "package", "core", "thread", "node"])
+
+
+class Topology:
+    """
+    Detects which logical CPUs share a physical core or NUMA node
+    and plans where mining workers get pinned.
+    Policies (affinity in Settings.cfg):
+      none    - leave placement to the OS scheduler
+      cores   - one worker per physical core first, node by node,
+                SMT siblings only after every core has a worker
+      spread  - physical cores first, alternating between NUMA nodes;
+                a worker with several native threads keeps all of its
+                CPUs on one node
+      compact - fill SMT siblings of a core before the next core
+    """
+    POLICIES = ("none", "cores", "spread", "compact")
+
+    def parse_cpu_list(text: str) -> list:
+        """
+        "0-3,8,10-11" => [0, 1, 2, 3, 8, 10, 11]
+        """
+        cpus = []
+        for part in text.strip().split(","):
+            if not part:
+                continue
+            if "-" in part:
+                first, last = part.split("-")
+                cpus.extend(range(int(first), int(last) + 1))
+            else:
+                cpus.append(int(part))
+        return cpus
+
+    def detect(sysfs: str = Settings.SYSFS_CPU) -> list:
+        """
+        Returns the LogicalCPUs this process may run on.
+        Without sysfs (Windows, macOS) every CPU is its own core
+        """
+        try:
+            allowed = sorted(os.sched_getaffinity(0))
+        except AttributeError:
+            allowed = list(range(cpu_count()))
+
+        nodes = {}
+        for node_dir in Path(sysfs + "/node").glob("node[0-9]*"):
+            try:
+                cpulist = (node_dir / "cpulist").read_text()
+            except OSError:
+                continue
+            for cpu in Topology.parse_cpu_list(cpulist):
+                nodes[cpu] = int(node_dir.name[4:])
+
+        cpus = []
+        for cpu in allowed:
+            topology = Path(f"{sysfs}/cpu/cpu{cpu}/topology")
+            try:
+                package = int((topology / "physical_package_id").read_text())
+                core = int((topology / "core_id").read_text())
+                siblings = sorted(Topology.parse_cpu_list(
+                    (topology / "thread_siblings_list").read_text()))
+            except (OSError, ValueError):
+                package, core, siblings = 0, cpu, [cpu]
+            thread = siblings.index(cpu) if cpu in siblings else 0
+            cpus.append(LogicalCPU(cpu, package, core, thread,
+                                   nodes.get(cpu, 0)))
+        return cpus
+
+    def order(cpus: list, policy: str) -> list:
+        if policy == "cores":
+            return sorted(cpus, key=lambda c: (c.thread, c.node, c.package,
+                                               c.core, c.cpu))
+        if policy == "spread":
+            rank, seen = {}, {}
+            for c in sorted(cpus, key=lambda c: (c.node, c.package,
+                                                 c.core, c.cpu)):
+                key = (c.node, c.thread)
+                rank[c.cpu] = seen.get(key, 0)
+                seen[key] = rank[c.cpu] + 1
+            return sorted(cpus, key=lambda c: (c.thread, rank[c.cpu],
+                                               c.node, c.cpu))
+        if policy == "compact":
+            return sorted(cpus, key=lambda c: (c.node, c.package, c.core,
+                                               c.thread, c.cpu))
+        return list(cpus)
+
+    def plan(cpus: list, policy: str, workers: int,
+             per_worker: int = 1) -> list:
+        """
+        Returns the CPU set for each worker, None when not pinned.
+        Workers running several native threads get per_worker CPUs
+        which the native threads inherit
+        """
+        if policy == "none" or not cpus:
+            return [None] * workers
+        if policy == "spread" and per_worker > 1:
+            # Workers alternate between nodes, the CPUs of each one
+            # come from its own node's cores order
+            nodes = sorted({c.node for c in cpus})
+            local = {node: Topology.order(
+                [c for c in cpus if c.node == node], "cores")
+                for node in nodes}
+            used = dict.fromkeys(nodes, 0)
+            placement = []
+            for i in range(workers):
+                node = nodes[i % len(nodes)]
+                placement.append([
+                    local[node][(used[node] + j) % len(local[node])].cpu
+                    for j in range(per_worker)])
+                used[node] += per_worker
+            return placement
+        ordered = Topology.order(cpus, policy)
+        return [[ordered[(i * per_worker + j) % len(ordered)].cpu
+                 for j in range(per_worker)]
+                for i in range(workers)]
+
+    def pin(pid: int, cpu_set: list):
+        if not cpu_set:
+            return
+        try:
+            os.sched_setaffinity(pid, cpu_set)
+        except (AttributeError, OSError) as e:
+            debug_output(f"Can't pin process {pid} to {cpu_set}: {e}")
+
+
+class Calibration:
+    """
+    Measures sustained hashrate for combinations of worker processes,
+    native threads per worker and GPU chunk sizes, then keeps the best.
+    Rounds are interleaved across candidates and the median is used
+    so a burst of turbo or a thermal dip doesn't pick the winner
+    """
+    WARMUP_TIME = 1
+    TRIAL_TIME = 3
+    ROUNDS = 3
+    CALL_HASHES = 250_000
+    GPU_CHUNKS = (32_768, 65_536, 131_072, 262_144, 524_288, 1_048_576)
+
+    def cpu_name(cpu: dict) -> str:
+        name = cpu.get("brand_raw") or osprocessor() or "unknown"
+        return name.replace("]", ")").strip()
+
+    def section(cpu_name: str) -> str:
+        return Settings.CALIBRATION_SECTION + cpu_name
+
+    def candidates(cpus: list, backend: str) -> list:
+        """
+        (workers, native threads, gpu chunk) combinations to try.
+        CPU splits both the physical and the logical core count
+        between processes and native threads
+        """
+        if backend == "gpu":
+            return [(workers, 1, chunk)
+                    for workers in (1, 2)
+                    for chunk in Calibration.GPU_CHUNKS]
+
+        physical = len({(c.package, c.core) for c in cpus}) or 1
+        logical = len(cpus) or cpu_count()
+        combos = []
+        for total in sorted({physical, logical}):
+            native_threads = 1
+            while native_threads <= total:
+                if total % native_threads == 0:
+                    combos.append((total // native_threads, native_threads, 0))
+                native_threads *= 2
+        return combos
+
+    def worker(id: int, native_threads: int, gpu_chunk: int,
+               counters, stop, kernel: dict = None):
+        """
+        Hashes an unreachable target in short calls and counts hashes
+        """
+        Algorithms.start_kernel(kernel or {})
+        base = hashlib.sha1(str(id).encode("ascii")).hexdigest()
+        hasher = libducohasher.DUCOHasher(base.encode("ascii"))
+        args = Algorithms.tuning_args({"native_threads": native_threads,
+                                       "gpu_chunk": gpu_chunk})
+        if gpu_chunk:
+            diff = gpu_chunk * 8 // 100
+        else:
+            diff = Calibration.CALL_HASHES * native_threads // 100
+        while not stop.is_set():
+            counters[id] += hasher.DUCOS1(bytes(20), diff, 100, **args)[1]
+
+    def trial(workers: int, native_threads: int, gpu_chunk: int,
+              placement: list, kernel: dict = None) -> float:
+        stop = Event()
+        counters = Array("d", workers, lock=False)
+        procs = []
+        for i in range(workers):
+            p = Process(target=Calibration.worker,
+                        args=[i, native_threads, gpu_chunk, counters, stop,
+                              kernel])
+            p.start()
+            Topology.pin(p.pid, placement[i])
+            procs.append(p)
+
+        sleep(Calibration.WARMUP_TIME)
+        hashes_before, time_before = sum(counters), time()
+        sleep(Calibration.TRIAL_TIME)
+        hashes_after, time_after = sum(counters), time()
+
+        stop.set()
+        for p in procs:
+            p.join()
+        return (hashes_after - hashes_before) / (time_after - time_before)
+
+    def run(cpus: list, policy: str, kernel: dict = None) -> dict:
+        backend = Algorithms.BACKEND
+        combos = Calibration.candidates(cpus, backend)
+        pretty_print(f"Calibrating {backend} engine: {len(combos)} setups, "
+                     + f"{Calibration.ROUNDS} rounds, about "
+                     + str(len(combos) * Calibration.ROUNDS
+                           * (Calibration.WARMUP_TIME + Calibration.TRIAL_TIME))
+                     + "s", "info", "sys0")
+
+        results = {combo: [] for combo in combos}
+        for _ in range(Calibration.ROUNDS):
+            for combo in combos:
+                workers, native_threads, gpu_chunk = combo
+                placement = Topology.plan(cpus, policy, workers,
+                                          native_threads)
+                results[combo].append(Calibration.trial(
+                    workers, native_threads, gpu_chunk, placement, kernel))
+
+        best, best_hashrate = None, -1
+        for combo, hashrates in results.items():
+            hashrate = median(hashrates)
+            pretty_print(f"{combo[0]} workers x {combo[1]} native threads"
+                         + (f", chunk {combo[2]}" if combo[2] else "")
+                         + f": {get_prefix('H/s', hashrate, 2)}"
+                         + f" (±{get_prefix('H/s', (max(hashrates) - min(hashrates)) / 2, 1)})",
+                         "info", "sys0")
+            if hashrate > best_hashrate:
+                best, best_hashrate = combo, hashrate
+
+        return {"threads": best[0],
+                "native_threads": best[1],
+                "gpu_chunk": best[2],
+                "hashrate": round(best_hashrate)}
+
+    def load(cpu_name: str) -> dict:
+        section = Calibration.section(cpu_name)
+        if not configparser.has_section(section):
+            return None
+        try:
+            return {key: int(configparser[section][key])
+                    for key in ("threads", "native_threads",
+                                "gpu_chunk", "hashrate")}
+        except (KeyError, ValueError):
+            return None
+
+    def kernel_worker(device: str, results):
+        try:
+            results.put(libducohasher.tune_kernel(device))
+        except Exception as e:
+            results.put(str(e))
+
+    def tune_kernel(device: str) -> dict:
+        """
+        Tries every nonces-per-work-item and work-group size of the
+        specialised OpenCL kernel on the device. Runs in a child
+        process so the miner itself never opens an OpenCL context
+        before forking its workers, and a driver crash or hang there
+        only costs the tuning: the default setup is returned with the
+        reason in "failed", so it is cached and not retried every start
+        """
+        results = Queue()
+        p = Process(target=Calibration.kernel_worker, args=[device, results])
+        p.start()
+        deadline = time() + Settings.KERNEL_TUNE_TIMEOUT
+        result = None
+        while result is None:
+            try:
+                result = results.get(timeout=1)
+            except Empty:
+                if not p.is_alive():
+                    try:
+                        result = results.get(timeout=1)
+                    except Empty:
+                        result = ("tuning process exited with code"
+                                  + f" {p.exitcode}")
+                elif time() >= deadline:
+                    result = ("no result after"
+                              + f" {Settings.KERNEL_TUNE_TIMEOUT}s")
+        p.join(Settings.STOP_TIMEOUT)
+        if p.is_alive():
+            p.kill()
+            p.join()
+        if isinstance(result, str):
+            pretty_print(f"OpenCL kernel tuning failed: {result}, using the"
+                         + " default kernel setup (--calibrate tries again)",
+                         "warning", "sys0")
+            nonces_per_item, work_group = Settings.KERNEL_DEFAULT
+            return {"device": device, "nonces_per_item": nonces_per_item,
+                    "work_group": work_group, "hashrate": 0,
+                    "failed": result}
+        name, nonces_per_item, work_group, rate = result
+        return {"device": name, "nonces_per_item": nonces_per_item,
+                "work_group": work_group, "hashrate": round(rate)}
+
+    def load_kernel(device: str) -> tuple:
+        section = Settings.KERNEL_SECTION + device
+        if not configparser.has_section(section):
+            return None
+        try:
+            return (int(configparser[section]["nonces_per_item"]),
+                    int(configparser[section]["work_group"]))
+        except (KeyError, ValueError):
+            return None
+
+    def save_kernel(device: str, result: dict):
+        configparser[Settings.KERNEL_SECTION + device] = {
+            **result,
+            "tuned": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+        with open(Settings.DATA_DIR + Settings.SETTINGS_FILE,
+                  "w") as configfile:
+            configparser.write(configfile)
+
+    def save(cpu_name: str, result: dict):
+        configparser[Calibration.section(cpu_name)] = {
+            **result,
+            "backend": Algorithms.BACKEND,
+            "calibrated": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+        with open(Settings.DATA_DIR + Settings.SETTINGS_FILE,
+                  "w") as configfile:
+            configparser.write(configfile)
+
+
+class HashrateStats:
+    """
+    Rolling hashrate statistics in shared memory.
+    Every worker owns a ring of STATS_SLOTS (end time, duration, hashes
+    tried) job records in one flat array, plus a time-weighted EWMA of
+    its hashing rate (time constant EWMA_TIME). Readers in any process
+    get a true moving average over the last N seconds and share time
+    percentiles without touching the workers
+    """
+    FIELDS = 3
+
+    def __init__(self, workers: int, slots: int = Settings.STATS_SLOTS):
+        self.workers = workers
+        self.slots = slots
+        self.jobs = Array("d", workers * slots * HashrateStats.FIELDS,
+                          lock=False)
+        self.recorded = Array("q", workers, lock=False)
+        self.ewma = Array("d", workers, lock=False)
+        self.tier = Array("i", workers, lock=False)
+        self.tier_switches = Array("i", workers, lock=False)
+        self.started = time()
+
+    def record(self, id: int, hashes: int, start: float, end: float):
+        duration = max(end - start, 1e-9)
+        slot = self.recorded[id] % self.slots
+        offset = (id * self.slots + slot) * HashrateStats.FIELDS
+        self.jobs[offset:offset + HashrateStats.FIELDS] = [end, duration,
+                                                           hashes]
+        # Publish the slot only after it is written
+        self.recorded[id] += 1
+
+        rate = hashes / duration
+        if self.recorded[id] == 1:
+            self.ewma[id] = rate
+        else:
+            # Longer jobs move the average further
+            alpha = 1 - exp(-duration / Settings.EWMA_TIME)
+            self.ewma[id] += alpha * (rate - self.ewma[id])
+
+    def records(self, id: int) -> list:
+        """
+        (end, duration, hashes) of the worker's retained jobs, oldest first
+        """
+        count = min(self.recorded[id], self.slots)
+        first = self.recorded[id] - count
+        records = []
+        for n in range(first, first + count):
+            offset = (id * self.slots + n % self.slots) * HashrateStats.FIELDS
+            records.append(tuple(self.jobs[offset:offset
+                                           + HashrateStats.FIELDS]))
+        return records
+
+    def moving_average(self, window: float = Settings.HASHRATE_WINDOW,
+                       id: int = None, now: float = None) -> float:
+        """
+        Hashes tried in the last window seconds divided by the time covered,
+        for one worker or the sum of all. Jobs crossing the window edge
+        count in proportion
+        """
+        now = now or time()
+        total = 0.0
+        for worker in ([id] if id is not None else range(self.workers)):
+            records = self.records(worker)
+            if not records:
+                continue
+            covered_from = self.started
+            if self.recorded[worker] > self.slots:
+                # The ring wrapped: nothing is known before the oldest job
+                covered_from = records[0][0] - records[0][1]
+            window_start = max(now - window, covered_from)
+            span = now - window_start
+            if span <= 0:
+                continue
+            hashes = 0.0
+            for end, duration, tried in records:
+                overlap = min(end, now) - max(end - duration, window_start)
+                if overlap > 0:
+                    hashes += tried * min(1.0, overlap / duration)
+            total += hashes / span
+        return total
+
+    def ewma_total(self) -> float:
+        return sum(self.ewma)
+
+    def share_times(self, window: float = Settings.HASHRATE_WINDOW,
+                    id: int = None, now: float = None) -> tuple:
+        """
+        p50 and p95 job durations in the last window seconds
+        """
+        now = now or time()
+        durations = [duration
+                     for worker in ([id] if id is not None
+                                    else range(self.workers))
+                     for end, duration, _ in self.records(worker)
+                     if end >= now - window]
+        return percentile(durations, 50), percentile(durations, 95)
+
+    def median_since(self, id: int, first: int) -> float:
+        """
+        p50 duration of the worker's jobs numbered first and later
+        """
+        count = min(self.recorded[id] - first, self.slots)
+        return percentile([duration for _, duration, _
+                           in self.records(id)[-count:]], 50)
+
+    def switch_tier(self, id: int, tier: int):
+        self.tier[id] = tier
+        self.tier_switches[id] += 1
+
+
+class Counters:
+    """
+    Per-worker share counters and hashrates in shared memory.
+    Every worker writes only its own slot, so no locks or Manager
+    round trips are needed and reading the totals costs the same
+    few microseconds whether there are 4 or 256 workers
+    """
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.accept = Array("i", workers, lock=False)
+        self.reject = Array("i", workers, lock=False)
+        self.blocks = Array("i", workers, lock=False)
+        self.aborts = Array("i", workers, lock=False)
+        self.heartbeat = Array("d", workers, lock=False)
+        self.ready = Array("d", workers, lock=False)
+        self.restarts = Array("i", workers, lock=False)
+        self.lost_time = Array("d", workers, lock=False)
+        self.incidents = Array("i", workers, lock=False)
+        self.downtime = Array("d", workers, lock=False)
+        self.stats = HashrateStats(workers)
+
+    def totals(self) -> tuple:
+        return sum(self.accept), sum(self.reject)
+
+
+class DifficultyTiers:
+    """
+    Picks each worker's difficulty tier from its own share times.
+    Every TIER_MIN_JOBS jobs the median job time since the last check
+    is compared with the share time band: below it the worker moves
+    one tier up, unless the difficulty last seen on that tier predicts
+    a share time above the band, above it one tier down. Throttling or
+    a changing load moves the tier as well
+    """
+    def parse_band(text: str) -> tuple:
+        low, high = (float(value) for value in text.split("-"))
+        return low, high
+
+    def index(name: str) -> int:
+        """
+        Tier of a start_diff name, names outside DIFF_TIERS start
+        auto-difficulty from the top tier
+        """
+        if name in Settings.DIFF_TIERS:
+            return Settings.DIFF_TIERS.index(name)
+        return len(Settings.DIFF_TIERS) - 1
+
+    def choose(tier: int, share_time: float, band: tuple,
+               diff: int, tier_diffs: list) -> int:
+        low, high = band
+        if share_time > high and tier > 0:
+            return tier - 1
+        if share_time < low and tier < len(Settings.DIFF_TIERS) - 1:
+            next_diff = tier_diffs[tier + 1]
+            if next_diff and share_time * next_diff / max(diff, 1) > high:
+                return tier
+            return tier + 1
+        return tier
+
+
+class Fleet:
+    """
+    Starts the mining workers, staggering their start so a large
+    fleet doesn't open every node connection at the same moment,
+    then supervises them from the main process: a worker that exits
+    or stops sending heartbeats for hang_after seconds is restarted,
+    at once the first time and with exponential backoff while it
+    keeps failing. Workers are forked from the warm main process with
+    the engine loaded and the node already picked, so a restart only
+    costs the fork and a reconnect
+    """
+    def __init__(self, workers: int, target, worker_args, placement: list,
+                 counters: Counters = None, hang_after: float = 0):
+        self.target = target
+        self.worker_args = worker_args
+        self.placement = placement
+        self.counters = counters
+        self.hang_after = hang_after
+        self.processes = [None] * workers
+        self.started = [0.0] * workers
+        self.failures = [0] * workers
+        # Pending restart time and when the failed worker last did work
+        self.restart_at = [None] * workers
+        self.down_since = [None] * workers
+
+    def start_worker(self, id: int):
+        self.started[id] = time()
+        p = Process(target=self.target, args=self.worker_args(id))
+        p.start()
+        Topology.pin(p.pid, self.placement[id])
+        self.processes[id] = p
+
+    def start(self, stagger: float = Settings.START_STAGGER):
+        for id in range(len(self.processes)):
+            if id and stagger:
+                sleep(stagger)
+            self.start_worker(id)
+
+    def alive(self) -> int:
+        return sum(1 for p in self.processes if p and p.is_alive())
+
+    def stop(self, timeout: float = Settings.STOP_TIMEOUT):
+        """
+        SIGTERM ends a worker even inside a native search, which
+        doesn't return to the interpreter to run signal handlers.
+        Workers still running after timeout seconds are killed
+        """
+        for p in self.processes:
+            if p and p.is_alive():
+                p.terminate()
+        deadline = time() + timeout
+        for p in self.processes:
+            if p:
+                p.join(max(0, deadline - time()))
+                if p.is_alive():
+                    p.kill()
+                    p.join()
+
+    def backoff(self, id: int) -> float:
+        if time() - self.started[id] >= Settings.RESTART_RESET_TIME:
+            self.failures[id] = 0
+        self.failures[id] += 1
+        if self.failures[id] == 1:
+            return 0
+        return min(Settings.RESTART_BACKOFF * 2 ** (self.failures[id] - 2),
+                   Settings.RESTART_BACKOFF_MAX)
+
+    def supervise(self, print_queue):
+        """
+        One supervision pass: detects failed workers, starts due
+        restarts and books the time lost once a restarted worker
+        sends its first heartbeat
+        """
+        counters = self.counters
+        now = time()
+        for id, p in enumerate(self.processes):
+            if self.restart_at[id] is not None:
+                if now >= self.restart_at[id]:
+                    self.restart_at[id] = None
+                    self.start_worker(id)
+                continue
+
+            if (self.down_since[id] is not None
+                    and counters.ready[id] >= self.started[id]):
+                lost = counters.ready[id] - self.down_since[id]
+                warmup = counters.ready[id] - self.started[id]
+                counters.lost_time[id] += lost
+                self.down_since[id] = None
+                pretty_print(f"Worker {id} restarted in"
+                             + f" {warmup * 1000:.0f}ms ({lost:.1f}s lost)",
+                             "success", "sys0", print_queue=print_queue)
+
+            hung = (self.hang_after and p.is_alive()
+                    and counters.heartbeat[id] >= self.started[id]
+                    and now - counters.heartbeat[id] > self.hang_after)
+            if hung:
+                p.kill()
+                p.join()
+            if p.is_alive():
+                continue
+
+            reason = ("hung" if hung else f"exited (code {p.exitcode})")
+            delay = self.backoff(id)
+            pretty_print(f"Worker {id} {reason}, restarting"
+                         + (f" in {delay:g}s" if delay else ""),
+                         "warning", "sys0", print_queue=print_queue)
+            counters.restarts[id] += 1
+            self.down_since[id] = max(counters.heartbeat[id],
+                                      self.started[id])
+            self.restart_at[id] = now + delay
+
+    def summary(self, counters: Counters) -> str:
+        accepted, rejected = counters.totals()
+        shares = max(accepted + rejected, 1)
+        return (f"{self.alive()}/{len(self.processes)} workers"
+                + f" ∙ {accepted}/{accepted + rejected} "
+                + get_string("accepted_shares").strip()
+                + f" ({round(accepted / shares * 100)}%)"
+                + f" ∙ {get_prefix('H/s', counters.stats.moving_average(), 2)}"
+                + f" ∙ {sum(counters.blocks)} blocks"
+                + f" ∙ {sum(counters.aborts)} jobs abandoned"
+                + f" ∙ {sum(counters.stats.tier_switches)} tier switches"
+                + f" ∙ {sum(counters.restarts)} restarts"
+                + f" ({sum(counters.lost_time):.0f}s lost)"
+                + f" ∙ {sum(counters.incidents)} network incidents"
+                + f" ({sum(counters.downtime):.0f}s down)")
+
+    def watch(self, counters: Counters, print_queue,
+              show_summary: bool = False, status: StatusFile = None):
+        """
+        Supervises the workers and, when share lines are hidden,
+        prints one aggregated line per SUMMARY_TIME.
+        Refreshes the status file header every second
+        """
+        last_summary = time()
+        while True:
+            sleep(1)
+            if status:
+                status.update_header(counters.stats.moving_average())
+            self.supervise(print_queue)
+
+            if show_summary and time() - last_summary >= Settings.SUMMARY_TIME:
+                pretty_print(self.summary(counters), "success", "sys0",
+                             print_queue=print_queue)
+                last_summary = time()
+
+
+SessionConfig = namedtuple("SessionConfig", ["name", "username", "mining_key",
+                                             "start_diff", "node", "weight",
+                                             "connections"])
+
+
+class Session:
+    """
+    One pool connection mining for one account. Sessions only do the
+    network I/O: their jobs are hashed by the Scheduler's executors
+    and the results come back here to be submitted on the same socket
+    """
+    def __init__(self, id: int, config: SessionConfig, weight: float,
+                 scheduler):
+        self.id = id
+        self.config = config
+        self.weight = weight
+        self.scheduler = scheduler
+        self.sock = None
+        self.virtual_time = 0.0
+        self.accepted, self.rejected, self.blocks = 0, 0, 0
+        self.hashes, self.busy_time, self.hashrate = 0, 0.0, 0.0
+        self.aborted = 0
+        # Network incident in progress: (kind, start time)
+        self.incident = None
+        self.incidents, self.downtime = 0, 0.0
+        self.retries = 0
+        self.done = Condition()
+        self.result = None
+        if config.mining_key != "None":
+            self.key = b64.b64decode(config.mining_key).decode("utf-8")
+        else:
+            self.key = config.mining_key
+
+    def connect(self, pool: tuple):
+        self.sock = socket()
+        self.sock.settimeout(Settings.SOC_TIMEOUT)
+        self.sock.connect(pool)
+        return self.recv(5)
+
+    def send(self, msg: str):
+        self.sock.sendall(str(msg).encode(Settings.ENCODING))
+
+    def recv(self, limit: int = 128):
+        data = self.sock.recv(limit)
+        if not data:
+            raise ConnectionResetError("connection closed by the node")
+        return data.decode(Settings.ENCODING).rstrip("\n")
+
+    def drain(self):
+        """
+        Same as Client.drain, on this session's socket
+        """
+        self.sock.settimeout(0)
+        try:
+            while self.sock.recv(4096):
+                pass
+        except OSError:
+            pass
+        self.sock.settimeout(Settings.SOC_TIMEOUT)
+
+    def begin_incident(self, kind: str):
+        if not self.incident:
+            self.incident = (kind, time())
+            self.incidents += 1
+
+    def request_job(self, print_queue) -> list:
+        """
+        Asks until the node hands out a job. Refusals back off on the
+        same connection, a malformed job raises ValueError
+        """
+        while True:
+            self.send("JOB" + Settings.SEPARATOR + self.config.username
+                      + Settings.SEPARATOR + self.config.start_diff
+                      + Settings.SEPARATOR + self.key
+                      + Settings.SEPARATOR)
+            job = self.recv().split(Settings.SEPARATOR)
+            if len(job) == 3:
+                if len(job[1]) != 40 or len(bytes.fromhex(job[1])) != 20:
+                    raise ValueError(f"expected hash {job[1]!r} is not SHA1")
+                int(job[2])
+                break
+            self.begin_incident("message")
+            pretty_print(f"{self.config.name}: node message: {job[-1]}",
+                         "warning", "net" + str(self.id),
+                         print_queue=print_queue)
+            sleep(Client.backoff(self.retries + 2))
+            self.retries += 1
+
+        if self.incident:
+            down = time() - self.incident[1]
+            self.downtime += down
+            pretty_print(f"{self.config.name}: recovered from"
+                         + f" {self.incident[0]} in {down:.1f}s", "success",
+                         "net" + str(self.id), print_queue=print_queue)
+            self.incident = None
+        self.retries = 0
+        return job
+
+    def finish(self, result: tuple):
+        with self.done:
+            self.result = result
+            self.done.notify()
+
+    def wait_result(self) -> tuple:
+        with self.done:
+            while self.result is None:
+                self.done.wait()
+            result, self.result = self.result, None
+            return result
+
+    def run(self, pool: tuple, identifier: str, single_miner_id: str,
+            print_queue, show_shares: bool):
+        """
+        Errors recover the way Miner.mine does: a malformed reply is
+        drained and the job asked again on the same connection (up to
+        SOCKET_RETRIES times), anything else reconnects with a jittered
+        backoff
+        """
+        attempt, abandons = 0, 0
+        while True:
+            try:
+                self.connect(pool)
+                attempt = 0
+                while True:
+                    try:
+                        job = self.request_job(print_queue)
+                    except (ValueError, IndexError) as e:
+                        if self.retries >= Settings.SOCKET_RETRIES:
+                            raise
+                        self.begin_incident("parse")
+                        self.retries += 1
+                        pretty_print(f"{self.config.name}: malformed reply"
+                                     + f" ({e}), requesting a new job",
+                                     "warning", "net" + str(self.id),
+                                     print_queue=print_queue)
+                        self.drain()
+                        continue
+                    self.scheduler.submit(self, job)
+                    nonce, hashrate, computetime = self.wait_result()
+                    if nonce is None:
+                        self.aborted += 1
+                        self.sock.close()
+                        sleep(Client.backoff(abandons))
+                        abandons += 1
+                        self.connect(pool)
+                        continue
+                    abandons = 0
+
+                    self.send(f"{nonce}" + Settings.SEPARATOR
+                              + f"{hashrate}" + Settings.SEPARATOR
+                              + f"Official PC Miner {Settings.VER}"
+                              + Settings.SEPARATOR + f"{identifier}"
+                              + Settings.SEPARATOR + Settings.SEPARATOR
+                              + f"{single_miner_id}")
+                    time_start = time()
+                    feedback = self.recv().split(Settings.SEPARATOR)
+                    ping = (time() - time_start) * 1000
+
+                    if feedback[0] == "BAD":
+                        self.rejected += 1
+                    else:
+                        self.accepted += 1
+                        if feedback[0] == "BLOCK":
+                            self.blocks += 1
+                    if self.scheduler.status:
+                        self.scheduler.status.update_worker(
+                            self.id, self.accepted, self.rejected,
+                            self.blocks, job[2], hashrate, computetime,
+                            ping, pool)
+                    if show_shares:
+                        share_type = {"GOOD": "accept", "BLOCK": "block",
+                                      "BAD": "reject"}.get(feedback[0])
+                        if share_type:
+                            share_print(self.id, share_type,
+                                        self.accepted, self.rejected,
+                                        hashrate, self.scheduler.hashrate(),
+                                        computetime, job[2], ping,
+                                        Back.YELLOW,
+                                        feedback[1] if len(feedback) > 1
+                                        else None,
+                                        print_queue=print_queue)
+            except Exception as e:
+                kind = Client.classify(e)
+                self.begin_incident(kind)
+                pretty_print(f"{self.config.name}: "
+                             + get_string("error_while_mining")
+                             + f" {e} ({kind}), reconnecting",
+                             "error", "net" + str(self.id),
+                             print_queue=print_queue)
+                if self.sock:
+                    self.sock.close()
+                self.retries = 0
+                sleep(Client.backoff(attempt))
+                attempt += 1
+
+
+class Scheduler:
+    """
+    Mines for many accounts and nodes from one process.
+    Every session (a [Session name] section of Settings.cfg plus the
+    main account) holds its own connections; their jobs go to one
+    shared set of executor threads, each hashing with native_threads.
+    Ready jobs are served by start-time fair queueing: a connection's
+    virtual time grows by the hashes it used divided by its weight,
+    and the waiting job with the lowest virtual time runs next
+    """
+    def __init__(self, configs: list, executors: int, job_mul: int,
+                 pools: dict, max_range: int = 0):
+        self.configs = configs
+        self.executors = executors
+        self.job_mul = job_mul
+        self.max_range = max_range
+        self.pools = pools
+        self.ready = []
+        self.lock = Condition()
+        self.order = count()
+        self.virtual_time = 0.0
+        self.status = None
+        self.sessions = []
+        for config in configs:
+            for _ in range(config.connections):
+                # A session's connections split its weight, so the
+                # account as a whole gets the configured share
+                self.sessions.append(Session(len(self.sessions), config,
+                                             config.weight / config.connections,
+                                             self))
+        # One slot per session, fed by the executors
+        self.stats = HashrateStats(len(self.sessions))
+
+    def load_sessions(user_settings, executors: int) -> list:
+        """
+        The main account followed by every [Session name] section.
+        connections = auto opens enough connections to keep every
+        executor busy while other jobs are in flight on the network,
+        and at least two per account so its weight holds while one
+        connection waits for the node
+        """
+        sections = [("main", user_settings)] + [
+            (name[len(Settings.SESSION_SECTION):], configparser[name])
+            for name in configparser.sections()
+            if name.startswith(Settings.SESSION_SECTION)]
+        configs = []
+        for name, section in sections:
+            weight = float(section.get("weight", 1))
+            if not weight > 0:
+                raise ValueError(f"session {name}: weight must be positive,"
+                                 + f" got {section.get('weight')}")
+            connections = section.get("connections", "auto")
+            if connections == "auto":
+                connections = max(2, ceil(2 * executors / len(sections)))
+            configs.append(SessionConfig(
+                name, section.get("username", user_settings["username"]),
+                section.get("mining_key", "None"),
+                section.get("start_diff", user_settings["start_diff"]),
+                section.get("node", "auto"), weight,
+                max(1, int(connections))))
+        return configs
+
+    def pool_for(self, config: SessionConfig) -> tuple:
+        if config.node == "auto":
+            return self.pools["auto"]
+        host, port = config.node.rsplit(":", 1)
+        return (host, int(port))
+
+    def submit(self, session: Session, job: list):
+        with self.lock:
+            # A connection that was idle gets no credit for the time away
+            start = max(session.virtual_time, self.virtual_time)
+            heappush(self.ready, (start, next(self.order), session, job))
+            self.lock.notify()
+
+    def next_job(self) -> tuple:
+        with self.lock:
+            while not self.ready:
+                self.lock.wait()
+            start, _, session, job = heappop(self.ready)
+            self.virtual_time = start
+            return start, session, job
+
+    def executor(self):
+        while True:
+            start, session, job = self.next_job()
+            try:
+                if not session.weight > 0:
+                    raise ValueError(f"session weight {session.weight}")
+                time_start = time()
+                diff, job_mul = Algorithms.search_range(
+                    int(job[2]), self.job_mul, self.max_range)
+                nonce, hashrate, hashes = Algorithms.DUCOS1(
+                    job[0], job[1], diff, job_mul)
+                computetime = time() - time_start
+                self.stats.record(session.id, hashes, time_start,
+                                  time_start + computetime)
+                with self.lock:
+                    session.virtual_time = start + hashes / session.weight
+                session.hashes += hashes
+                session.busy_time += computetime
+                session.hashrate = hashrate
+                if nonce == 0 and not Algorithms.check_nonce(job[0], job[1],
+                                                             0):
+                    # Abandoned: the session reconnects instead of submitting
+                    nonce = None
+                session.finish((nonce, hashrate, computetime))
+            except Exception:
+                # The session gets the job back as abandoned, otherwise it
+                # would wait for a result forever and the executor is lost
+                session.finish((None, 0, 0))
+
+    def hashrate(self) -> float:
+        return self.stats.ewma_total()
+
+    def start(self, user_settings, single_miner_id: str, print_queue):
+        show_shares = Miner.share_lines_enabled(user_settings,
+                                                len(self.sessions))
+        for _ in range(self.executors):
+            Thread(target=self.executor, daemon=True).start()
+        for session in self.sessions:
+            Thread(target=session.run, daemon=True,
+                   args=[self.pool_for(session.config),
+                         user_settings["identifier"], single_miner_id,
+                         print_queue, show_shares]).start()
+            sleep(Settings.START_STAGGER)
+
+    def summary(self) -> list:
+        """
+        One line per account: shares, hashrate and its share of hashing
+        """
+        busy = sum(session.busy_time for session in self.sessions) or 1
+        lines = []
+        for config in self.configs:
+            own = [s for s in self.sessions if s.config is config]
+            accepted = sum(s.accepted for s in own)
+            rejected = sum(s.rejected for s in own)
+            lines.append(f"{config.name} ({config.username}, "
+                         + f"{config.start_diff}, weight {config.weight:g})"
+                         + f" ∙ {accepted}/{accepted + rejected} "
+                         + get_string("accepted_shares").strip()
+                         + f" ∙ {get_prefix('H/s', sum(s.hashrate for s in own), 2)}"
+                         + f" ∙ {sum(s.blocks for s in own)} blocks"
+                         + f" ∙ {sum(s.aborted for s in own)} abandoned"
+                         + f" ∙ {round(sum(s.busy_time for s in own) / busy * 100)}%"
+                         + " of hashing time")
+        return lines
+
+    def watch(self, print_queue, report_time: int):
+        last_report = time()
+        while True:
+            sleep(1)
+            if self.status:
+                self.status.update_header(self.hashrate())
+            if time() - last_report < report_time:
+                continue
+            last_report = time()
+            for line in self.summary():
+                pretty_print(line, "success", "sys0",
+                             print_queue=print_queue)
+
+
+class Agent:
+    """
+    Light agent mode (--agent host:port): the settings, extra accounts
+    and pool node come from a fleet controller (fleet_controller.py)
+    instead of the local setup, and a compact stats record goes back
+    to it every AGENT_STATS_TIME seconds
+    """
+    def __init__(self, address: str):
+        self.address = fleet_protocol.parse_address(address)
+        self.sock = None
+        self.node = None
+
+    def connect(self) -> dict:
+        sock = socket()
+        sock.settimeout(Settings.SOC_TIMEOUT)
+        sock.connect(self.address)
+        fleet_protocol.send_json(sock, fleet_protocol.HELLO, {
+            "host": gethostname(), "pid": os.getpid(),
+            "cpus": cpu_count(), "backend": Algorithms.BACKEND,
+            "version": Settings.VER,
+            "node": f"{self.node[0]}:{self.node[1]}" if self.node else ""})
+        kind, payload = fleet_protocol.recv_frame(sock)
+        if kind != fleet_protocol.CONFIG:
+            sock.close()
+            raise ValueError("controller sent no configuration")
+        self.sock = sock
+        return json.loads(payload)
+
+    def configure(self) -> dict:
+        attempt = 0
+        while True:
+            try:
+                config = self.connect()
+                break
+            except (OSError, ValueError) as e:
+                pretty_print(f"Fleet controller {self.address[0]}:"
+                             + f"{self.address[1]} unavailable ({e})",
+                             "warning", "net0")
+                sleep(Client.backoff(attempt))
+                attempt += 1
+        if config["node"]:
+            self.node = fleet_protocol.parse_address(config["node"])
+        Agent.apply(config)
+        return config
+
+    def apply(config: dict):
+        """
+        Writes the pushed settings and accounts to Settings.cfg, so
+        load_cfg reads them without asking and the host keeps the last
+        configuration if the controller goes away
+        """
+        configparser.read(Settings.DATA_DIR + Settings.SETTINGS_FILE)
+        section = dict(fleet_protocol.AGENT_DEFAULTS)
+        if configparser.has_section("PC Miner"):
+            section.update(configparser["PC Miner"])
+        section.update(config["settings"])
+        configparser["PC Miner"] = section
+        for name in configparser.sections():
+            if name.startswith(Settings.SESSION_SECTION):
+                configparser.remove_section(name)
+        for name, session in config["sessions"].items():
+            configparser[Settings.SESSION_SECTION + name] = session
+        with open(Settings.DATA_DIR + Settings.SETTINGS_FILE,
+                  "w") as configfile:
+            configparser.write(configfile)
+
+    def fleet_stats(counters: Counters):
+        accepted, rejected = counters.totals()
+        return fleet_protocol.Stats(
+            time(), counters.workers, counters.stats.ewma_total(),
+            counters.stats.moving_average(), accepted, rejected,
+            sum(counters.blocks), sum(counters.aborts),
+            sum(counters.restarts), sum(counters.incidents),
+            sum(counters.downtime), sum(counters.stats.tier_switches),
+            counters.stats.share_times()[0])
+
+    def scheduler_stats(scheduler):
+        # The scheduler runs no worker processes and no auto-difficulty,
+        # so it never has restarts or tier switches
+        sessions = scheduler.sessions
+        return fleet_protocol.Stats(
+            time(), len(sessions), scheduler.stats.ewma_total(),
+            scheduler.stats.moving_average(),
+            sum(s.accepted for s in sessions),
+            sum(s.rejected for s in sessions),
+            sum(s.blocks for s in sessions),
+            sum(s.aborted for s in sessions), 0,
+            sum(s.incidents for s in sessions),
+            sum(s.downtime for s in sessions), 0,
+            scheduler.stats.share_times()[0])
+
+    def report(self, source):
+        """
+        Sends source() every AGENT_STATS_TIME seconds, reconnecting
+        to the controller if it restarts
+        """
+        while True:
+            sleep(Settings.AGENT_STATS_TIME)
+            try:
+                if not self.sock:
+                    self.connect()
+                fleet_protocol.send_frame(
+                    self.sock, fleet_protocol.STATS,
+                    fleet_protocol.pack_stats(source()))
+            except (OSError, ValueError):
+                if self.sock:
+                    self.sock.close()
+                self.sock = None
+
+    def start(self, source):
+        Thread(target=self.report, args=[source], daemon=True).start()
+
+
+class Governor:
+    """
+    Thermal and power throttle governor.
+    A thread in the main process reads the hottest CPU thermal zone and
+    the RAPL package energy counters and moves a duty cycle between
+    MIN_DUTY and intensity, so the temperature stays under target_temp
+    and package power under power_budget (W, 0 = no limit).
+    Workers read the duty cycle from shared memory: multi-threaded
+    workers run fewer native threads, the rest of the cut is idle time
+    after each job. The sysfs roots can point to a mocked tree
+    """
+    MIN_DUTY = 0.1
+    GAIN = 0.25
+    # Degrees of headroom that make a full GAIN step
+    TEMP_SCALE = 10
+    CONTROL_TIME = 2
+    ZONE_TYPES = ("cpu", "pkg", "soc", "core", "tctl", "k10temp")
+
+    def __init__(self, target_temp: float, power_budget: float,
+                 max_duty: float,
+                 thermal_root: str = Settings.SYSFS_THERMAL,
+                 powercap_root: str = Settings.SYSFS_POWERCAP):
+        self.target_temp = target_temp
+        self.power_budget = power_budget
+        self.max_duty = max(Governor.MIN_DUTY, min(1.0, max_duty))
+        # duty cycle, temperature, package power, hashes per joule
+        self.state = Array("d", [self.max_duty, 0, 0, 0], lock=False)
+        self.zones = Governor.find_zones(thermal_root)
+        self.domains = Governor.find_domains(powercap_root)
+        self.last_energy = None
+
+    def __getstate__(self):
+        # Workers only get the shared state
+        return {"state": self.state, "max_duty": self.max_duty}
+
+    def find_zones(thermal_root: str) -> list:
+        """
+        Temperature files of CPU thermal zones, all zones if none
+        of them looks like a CPU
+        """
+        zones, cpu_zones = [], []
+        for zone in sorted(Path(thermal_root).glob("thermal_zone*")):
+            try:
+                zone_type = (zone / "type").read_text().strip().lower()
+            except OSError:
+                zone_type = ""
+            zones.append(zone / "temp")
+            if any(name in zone_type for name in Governor.ZONE_TYPES):
+                cpu_zones.append(zone / "temp")
+        return cpu_zones or zones
+
+    def find_domains(powercap_root: str) -> list:
+        """
+        (energy_uj, max_energy_range_uj) of each RAPL package domain
+        """
+        domains = []
+        for domain in sorted(Path(powercap_root).glob("intel-rapl:*")):
+            if domain.name.count(":") != 1:
+                continue  # subdomains (core, uncore, dram) are in the package
+            try:
+                wrap = int((domain / "max_energy_range_uj").read_text())
+            except (OSError, ValueError):
+                wrap = 2 ** 32
+            domains.append((domain / "energy_uj", wrap))
+        return domains
+
+    def read_temperature(self) -> float:
+        temps = []
+        for zone in self.zones:
+            try:
+                temps.append(int(zone.read_text()) / 1000)
+            except (OSError, ValueError):
+                continue
+        return max(temps) if temps else None
+
+    def read_power(self, now: float) -> float:
+        """
+        Package power in W since the previous call, None without RAPL
+        """
+        try:
+            energy = [int(path.read_text()) for path, _ in self.domains]
+        except (OSError, ValueError):
+            # energy_uj is root-only on many kernels
+            self.domains = []
+            return None
+        if not energy:
+            return None
+
+        last, self.last_energy = self.last_energy, (now, energy)
+        if last is None or now <= last[0]:
+            return None
+        used = 0
+        for (_, wrap), before, after in zip(self.domains, last[1], energy):
+            used += after - before if after >= before else after + wrap - before
+        return used / 1e6 / (now - last[0])
+
+    def step(self, now: float, hashrate: float) -> float:
+        """
+        One control step, returns the new duty cycle
+        """
+        temp = self.read_temperature()
+        power = self.read_power(now)
+
+        headroom = 1.0
+        if self.target_temp and temp is not None:
+            headroom = min(headroom,
+                           (self.target_temp - temp) / Governor.TEMP_SCALE)
+        if self.power_budget and power is not None:
+            headroom = min(headroom,
+                           (self.power_budget - power) / self.power_budget)
+
+        duty = self.state[0] + Governor.GAIN * headroom
+        self.state[0] = max(Governor.MIN_DUTY, min(self.max_duty, duty))
+        self.state[1] = temp or 0
+        self.state[2] = power or 0
+        self.state[3] = hashrate / power if power else 0
+        return self.state[0]
+
+    def status(self) -> str:
+        duty, temp, power, per_joule = self.state
+        parts = [f"duty {round(duty * 100)}%"]
+        if temp:
+            parts.append(f"{round(temp, 1)}°C"
+                         + (f" (target {self.target_temp}°C)"
+                            if self.target_temp else ""))
+        if power:
+            parts.append(f"{round(power, 1)} W"
+                         + (f" (budget {self.power_budget} W)"
+                            if self.power_budget else ""))
+        if per_joule:
+            parts.append(get_prefix("H/J", per_joule, 2))
+        return "Governor: " + " ∙ ".join(parts)
+
+    def start(self, counters, print_queue, report_time: int):
+        Thread(target=self._control_loop,
+               args=[counters, print_queue, report_time],
+               daemon=True).start()
+
+    def _control_loop(self, counters, print_queue, report_time: int):
+        last_report = time()
+        while True:
+            sleep(Governor.CONTROL_TIME)
+            self.step(time(), counters.stats.moving_average())
+            if time() - last_report >= report_time:
+                pretty_print(self.status(), "info", "sys0",
+                             print_queue=print_queue)
+                last_report = time()
+
+    def active_threads(self, native_threads: int) -> int:
+        return max(1, min(native_threads,
+                          ceil(native_threads * self.state[0])))
+
+    def pause(self, busy_time: float, native_threads: int = 1,
+              active_threads: int = 1, heartbeat=None, id: int = 0):
+        """
+        Idles long enough after a job that the worker's average
+        native thread use matches the duty cycle. The pause can be many
+        times the job time, so it sleeps in slices and keeps beating
+        heartbeat[id] for the supervisor
+        """
+        duty = self.state[0] * native_threads / active_threads
+        if duty >= 1:
+            return
+        until = time() + busy_time * (1 - duty) / duty
+        while True:
+            if heartbeat is not None:
+                heartbeat[id] = time()
+            left = until - time()
+            if left <= 0:
+                break
+            sleep(min(left, Settings.HEARTBEAT_TIMEOUT / 4))
+
+
 class Donate:
     def load(donation_level):
         return
@@ -324,18 +1946,117 @@ def get_prefix(symbol: str,
 
 
 def get_rpi_temperature():
-    output = Popen(args='cat /sys/class/thermal/thermal_zone0/temp',
-                    stdout=PIPE,
-                    shell=True).communicate()[0].decode()
-    return round(int(output) / 1000, 2)
+    """
+    Last sample taken by the hardware side-channel, or a direct
+    sysfs read before it runs
+    """
+    if hardware and hardware.sampling:
+        return hardware.temperature()
+    with open(Settings.RPI_TEMPERATURE) as f:
+        return round(int(f.read()) / 1000, 2)
+
+
+class Hardware:
+    """
+    Raspberry Pi LED and temperature side-channel.
+    Threads in the main process own the sysfs handles, workers only post
+    LED events to a queue and read the last temperature sample from
+    shared memory, so a share never waits on a shell, sudo or a blink.
+    Events posted while a blink is running are merged into the next one
+    """
+    def __init__(self, leds: bool, temperature: bool):
+        self.events = Queue() if leds else None
+        self.sampling = temperature
+        self.temp = Value("d", 0.0, lock=False)
+
+    def __getstate__(self):
+        # Workers only get the queue and the shared sample
+        return {"events": self.events, "sampling": self.sampling,
+                "temp": self.temp}
+
+    def blink(self, led: str = "green"):
+        if self.events:
+            self.events.put_nowait(led)
+
+    def temperature(self) -> float:
+        return round(self.temp.value, 2)
+
+    def start(self):
+        if self.sampling:
+            self.temp_file = open(Settings.RPI_TEMPERATURE)
+            self._sample()
+            Thread(target=self._temperature_loop, daemon=True).start()
+        if self.events:
+            self.led_files = {led: Hardware.open_led(path)
+                              for led, path in Settings.RPI_LEDS.items()}
+            Thread(target=self._led_loop, daemon=True).start()
+
+    def open_led(path: str):
+        """
+        Opens the LED brightness file, falling back to one long-lived
+        sudo tee process when the miner doesn't run as root
+        """
+        try:
+            return open(path, "w")
+        except OSError:
+            pass
+        try:
+            return Popen(["sudo", "-n", "tee", path], stdin=PIPE,
+                         stdout=DEVNULL, stderr=DEVNULL, text=True).stdin
+        except OSError as e:
+            debug_output(f"Can't control LED {path}: {e}")
+            return None
+
+    def _write_led(self, led: str, value: str):
+        handle = self.led_files.get(led)
+        if handle:
+            try:
+                handle.write(value + "\n")
+                handle.flush()
+            except OSError as e:
+                debug_output(f"Error writing LED {led}: {e}")
+                self.led_files[led] = None
+
+    def _led_loop(self):
+        while True:
+            leds = {self.events.get()}
+            try:
+                while True:
+                    leds.add(self.events.get_nowait())
+            except Empty:
+                pass
+            for led in leds:
+                self._write_led(led, "1")
+            sleep(Settings.BLINK_TIME)
+            for led in leds:
+                self._write_led(led, "0")
+
+    def _sample(self):
+        self.temp_file.seek(0)
+        self.temp.value = int(self.temp_file.read()) / 1000
+
+    def _temperature_loop(self):
+        while True:
+            sleep(Settings.TEMPERATURE_TIME)
+            try:
+                self._sample()
+            except (OSError, ValueError) as e:
+                debug_output(f"Error reading temperature: {e}")
 
 
 def periodic_report(start_time, end_time, shares,
-                    blocks, hashrate, uptime):
+                    blocks, hashrate, uptime, share_times=None,
+                    aborts=0):
     """
     Displays nicely formated uptime stats
     """
     raspi_iot_reading = ""
+    share_time_reading = ""
+    if share_times:
+        share_time_reading = (f"\n\t\t∙ share time p50 {share_times[0]:.1f}s,"
+                              + f" p95 {share_times[1]:.1f}s")
+    if aborts:
+        share_time_reading += f"\n\t\t∙ {aborts} jobs abandoned"
     
     if running_on_rpi and user_settings["raspi_cpu_iot"] == "y":
         raspi_iot_reading = f"{get_string('rpi_cpu_temp')} {get_rpi_temperature()}°C"
@@ -358,6 +2079,7 @@ def periodic_report(start_time, end_time, shares,
                  + get_string("report_body6")
                  + get_string("total_mining_time")
                  + str(uptime)
+                 + share_time_reading
                  + raspi_iot_reading + "\n", "success")
 
 
@@ -385,7 +2107,17 @@ def pretty_print(msg: str = None,
     """
     Produces nicely formatted CLI output for messages:
     HH:MM:S |sender| msg
+    With a print_queue only a record is queued, the main process
+    renders it
     """
+    if print_queue != None:
+        print_queue.put(("message", time(), msg, state, sender))
+    else:
+        print(message_line(datetime.now().strftime("%H:%M:%S"),
+                           msg, state, sender))
+
+
+def message_line(clock: str, msg: str, state: str, sender: str) -> str:
     if sender.startswith("net"):
         bg_color = Back.BLUE
     elif sender.startswith("cpu"):
@@ -402,14 +2134,7 @@ def pretty_print(msg: str = None,
     else:
         fg_color = Fore.YELLOW
 
-    if print_queue != None:
-        print_queue.append(
-            Fore.WHITE + datetime.now().strftime(Style.DIM + "%H:%M:%S ")
-            + Style.RESET_ALL + Style.BRIGHT + bg_color + " " + sender + " "
-            + Style.NORMAL + Back.RESET + " " + fg_color + msg.strip())
-    else:
-        print(
-            Fore.WHITE + datetime.now().strftime(Style.DIM + "%H:%M:%S ")
+    return (Fore.WHITE + Style.DIM + clock + " "
             + Style.RESET_ALL + Style.BRIGHT + bg_color + " " + sender + " "
             + Style.NORMAL + Back.RESET + " " + fg_color + msg.strip())
 
@@ -419,85 +2144,152 @@ def share_print(id, type,
                 thread_hashrate, total_hashrate,
                 computetime, diff, ping,
                 back_color, reject_cause=None,
-                print_queue = None):
+                print_queue = None, share_times=None):
     """
-    Produces nicely formatted CLI output for shares:
+    Queues a share for the main process, which prints it as:
     HH:MM:S |cpuN| ⛏ Accepted 0/0 (100%) ∙ 0.0s ∙ 0 kH/s ⚙ diff 0 k ∙ ping 0ms
+    share_times (p50, p95) of the worker are shown after the share time
     """
-    thread_hashrate = get_prefix("H/s", thread_hashrate, 2)
-    total_hashrate = get_prefix("H/s", total_hashrate, 1)
-    diff = get_prefix("", int(diff), 0)
+    print_queue.put(("share", time(), id, type, accept, reject,
+                     thread_hashrate, total_hashrate, computetime, diff,
+                     ping, back_color, reject_cause, share_times))
 
-    def _blink_builtin(led="green"):
-        if led == "green":
-            os.system(
-                'echo 1 | sudo tee /sys/class/leds/led0/brightness >/dev/null 2>&1')
-            sleep(0.1)
-            os.system(
-                'echo 0 | sudo tee /sys/class/leds/led0/brightness >/dev/null 2>&1')
-        else:
-            os.system(
-                'echo 1 | sudo tee /sys/class/leds/led1/brightness >/dev/null 2>&1')
-            sleep(0.1)
-            os.system(
-                'echo 0 | sudo tee /sys/class/leds/led1/brightness >/dev/null 2>&1')
-    
-    if type == "accept":
-        if running_on_rpi and user_settings["raspi_leds"] == "y":
-            _blink_builtin()
-        share_str = get_string("accepted")
-        fg_color = Fore.GREEN
-    elif type == "block":
-        if running_on_rpi and user_settings["raspi_leds"] == "y":
-            _blink_builtin()
-        share_str = get_string("block_found")
-        fg_color = Fore.YELLOW
-    else:
-        if running_on_rpi and user_settings["raspi_leds"] == "y":
-            _blink_builtin("red")
-        share_str = get_string("rejected")
-        if reject_cause:
-            share_str += f"{Style.NORMAL}({reject_cause}) "
-        fg_color = Fore.RED
 
-    print_queue.append(Fore.WHITE + datetime.now().strftime(Style.DIM + "%H:%M:%S ")
-              + Style.RESET_ALL + Fore.WHITE + Style.BRIGHT + back_color
-              + f" cpu{id} " + Back.RESET + fg_color + Settings.PICK
-              + share_str + Fore.RESET + f"{accept}/{(accept + reject)}"
-              + Fore.YELLOW
-              + f" ({(round(accept / (accept + reject) * 100))}%)"
-              + Style.NORMAL + Fore.RESET
-              + f" ∙ {('%04.1f' % float(computetime))}s"
-              + Style.NORMAL + " ∙ " + Fore.BLUE + Style.BRIGHT
-              + f"{thread_hashrate}" + Style.DIM
-              + f" ({total_hashrate} {get_string('hashrate_total')})" + Fore.RESET + Style.NORMAL
-              + Settings.COG + f" {get_string('diff')} {diff} ∙ " + Fore.CYAN
-              + f"ping {(int(ping))}ms")
-
-
-def print_queue_handler(print_queue):
+class Renderer:
     """
-    Prevents broken console logs with many threads
+    Console output of the main process. Workers queue plain records
+    (share_print, pretty_print) instead of formatted strings, so a share
+    costs them one queue put. The translated words and colours between
+    the fields of every share type are joined once per language, the
+    clock is formatted once per second, difficulty prefixes are cached
+    and all records queued within CONSOLE_REFRESH are written at once.
+    The window title follows the share totals at most every
+    TITLE_REFRESH seconds
     """
-    while True:
-        if len(print_queue):
-            message = print_queue[0]
+    DIFF_CACHE = 256
+
+    def __init__(self):
+        self.templates = Renderer.compile()
+        self.diffs = {}
+        self.total = (None, "")
+        self.second = None
+        self.clock = ""
+        # Set once the workers exist, returns (accepted, rejected)
+        self.totals = None
+        self.shown_totals = None
+        self.title_time = 0
+
+    def compile() -> dict:
+        """
+        The constant text between the fields of each share type's line,
+        with the current language's strings and the colours in place
+        """
+        templates = {}
+        for type, name, fg_color in (("accept", "accepted", Fore.GREEN),
+                                     ("block", "block_found", Fore.YELLOW),
+                                     ("reject", "rejected", Fore.RED)):
+            templates[type] = (
+                Fore.WHITE + Style.DIM,
+                " " + Style.RESET_ALL + Fore.WHITE + Style.BRIGHT,
+                Back.RESET + fg_color + Settings.PICK + get_string(name),
+                Fore.RESET,
+                Fore.YELLOW + " (",
+                "%)" + Style.NORMAL + Fore.RESET + " ∙ ",
+                Style.NORMAL + " ∙ " + Fore.BLUE + Style.BRIGHT,
+                Style.DIM + " (",
+                " " + get_string("hashrate_total") + ")" + Fore.RESET
+                + Style.NORMAL + Settings.COG + " " + get_string("diff")
+                + " ",
+                " ∙ " + Fore.CYAN + "ping ")
+        return templates
+
+    def timestamp(self, stamp: float) -> str:
+        second = int(stamp)
+        if second != self.second:
+            self.second = second
+            self.clock = datetime.fromtimestamp(second).strftime("%H:%M:%S")
+        return self.clock
+
+    def share(self, record: tuple) -> str:
+        (_, stamp, id, type, accept, reject, thread_hashrate,
+         total_hashrate, computetime, diff, ping, back_color, reject_cause,
+         share_times) = record
+        (clock, cpu, label, counts, percent, share_time, hashrate, total,
+         difficulty, latency) = self.templates[type]
+        cause = ""
+        if type == "reject" and reject_cause:
+            cause = f"{Style.NORMAL}({reject_cause}) "
+        share_time_str = ""
+        if share_times:
+            share_time_str = (f"{Style.DIM} (p50 {share_times[0]:.1f}s"
+                              f" p95 {share_times[1]:.1f}s){Style.NORMAL}")
+        # Workers share a few difficulties and one total between reports
+        diff_str = self.diffs.get(diff)
+        if diff_str is None:
+            if len(self.diffs) >= Renderer.DIFF_CACHE:
+                self.diffs.clear()
+            diff_str = self.diffs[diff] = get_prefix("", int(diff), 0)
+        if total_hashrate != self.total[0]:
+            self.total = (total_hashrate,
+                          get_prefix("H/s", total_hashrate, 1))
+        shares = accept + reject
+        return (f"{clock}{self.timestamp(stamp)}{cpu}{back_color} cpu{id} "
+                f"{label}{cause}{counts}{accept}/{shares}{percent}"
+                f"{round(accept / (shares or 1) * 100)}{share_time}"
+                f"{float(computetime):04.1f}s{share_time_str}{hashrate}"
+                f"{get_prefix('H/s', thread_hashrate, 2)}{total}"
+                f"{self.total[1]}{difficulty}{diff_str}{latency}"
+                f"{int(ping)}ms")
+
+    def render(self, record) -> str:
+        if isinstance(record, str):
+            return record
+        if record[0] == "share":
+            return self.share(record)
+        _, stamp, msg, state, sender = record
+        return message_line(self.timestamp(stamp), msg, state, sender)
+
+    def update_title(self, now: float):
+        if not self.totals or now - self.title_time < Settings.TITLE_REFRESH:
+            return
+        totals = self.totals()
+        if totals != self.shown_totals:
+            accepted, rejected = totals
+            title(get_string('duco_python_miner') + str(Settings.VER)
+                  + f') - {accepted}/{(accepted + rejected)}'
+                  + get_string('accepted_shares'))
+            self.shown_totals = totals
+            self.title_time = now
+
+    def run(self, print_queue):
+        """
+        Prevents broken console logs with many threads
+        """
+        while True:
+            try:
+                records = [print_queue.get(timeout=Settings.TITLE_REFRESH)]
+            except Empty:
+                self.update_title(time())
+                continue
+            started = time()
+            while True:
+                try:
+                    records.append(print_queue.get_nowait())
+                except Empty:
+                    break
+            lines = "\n".join(self.render(record) for record in records)
             with printlock:
-                print(message)
-            print_queue.pop(0)
-        sleep(0.01)
+                sys.stdout.write(lines + "\n")
+                sys.stdout.flush()
+            self.update_title(started)
+            sleep(max(0, Settings.CONSOLE_REFRESH - (time() - started)))
 
 
 def get_string(string_name):
     """
     Gets a string from the language file
     """
-    if string_name in lang_file[lang]:
-        return lang_file[lang][string_name]
-    elif string_name in lang_file["english"]:
-        return lang_file["english"][string_name]
-    else:
-        return string_name
+    return strings.get(string_name, string_name)
 
 
 def has_mining_key(username):
@@ -715,6 +2507,11 @@ class Miner:
             print("Error with lang file, falling back to english: " + str(e))
             lang = "english"
 
+        # Flattened once, get_string is a single lookup
+        global strings
+        strings = dict(lang_file.get("english", {}))
+        strings.update(lang_file.get(lang, {}))
+
     def load_cfg():
         """
         Loads miner settings file or starts the config tool
@@ -771,12 +2568,7 @@ class Miner:
             if not threads:
                 threads = cpu_count()
 
-            if int(threads) > 16:
-                threads = 16
-                print(Style.BRIGHT + Fore.BLUE 
-                        + get_string("max_threads_notice") 
-                        + Style.RESET_ALL)
-            elif int(threads) < 1:
+            if int(threads) < 1:
                 threads = 1
 
             print(Style.BRIGHT
@@ -831,6 +2623,23 @@ class Miner:
                 "report_sec":    Settings.REPORT_TIME,
                 "raspi_leds":    Settings.RASPI_LEDS,
                 "raspi_cpu_iot": Settings.RASPI_CPU_IOT,
+                "capture_jobs":  Settings.CAPTURE_JOBS,
+                "affinity":      Settings.AFFINITY,
+                "job_mul":       Settings.JOB_MUL,
+                "native_threads": Settings.NATIVE_THREADS,
+                "gpu_chunk":     Settings.GPU_CHUNK,
+                "hybrid":        Settings.HYBRID,
+                "job_timeout":   Settings.JOB_TIMEOUT,
+                "max_range":     Settings.MAX_RANGE,
+                "auto_diff":     Settings.AUTO_DIFF,
+                "share_time_band": Settings.SHARE_TIME_BAND,
+                "opencl_device": Settings.OPENCL_DEVICE,
+                "hybrid_cpu_diff": Settings.HYBRID_CPU_DIFF,
+                "share_lines":   Settings.SHARE_LINES,
+                "governor":      Settings.GOVERNOR,
+                "target_temp":   Settings.TARGET_TEMP,
+                "power_budget":  Settings.POWER_BUDGET,
+                "status_file":   Settings.STATUS_FILE,
                 "discord_rp":    "y"}
 
             with open(Settings.DATA_DIR + Settings.SETTINGS_FILE,
@@ -842,18 +2651,35 @@ class Miner:
                           + Settings.SETTINGS_FILE)
         return configparser["PC Miner"]
 
-    def m_connect(id, pool):
+    def share_lines_enabled(user_settings, workers: int) -> bool:
+        """
+        One line per share is readable up to SHARE_LINES_MAX workers,
+        larger fleets only get the aggregated summary
+        """
+        if user_settings["share_lines"] == "auto":
+            return workers <= Settings.SHARE_LINES_MAX
+        return user_settings["share_lines"] == "y"
+
+    def m_connect(id, pool, quiet: bool = False, counters=None,
+                  reconnect: bool = False, attempts: int = 0):
         retry_count = 0
         while True:
+            if reconnect:
+                sleep(Client.backoff(attempts))
+            if counters:
+                # Waiting for the network is not a hang
+                counters.heartbeat[id] = time()
             try:
                 if retry_count > 3:
-                    pool = Client.fetch_pool()
+                    pool = Client.fetch_pool(
+                        heartbeat=counters.heartbeat if counters else None,
+                        id=id)
                     retry_count = 0
 
                 socket_connection = Client.connect(pool)
                 POOL_VER = Client.recv(5)
 
-                if id == 0:
+                if id == 0 and not quiet:
                     Client.send("MOTD")
                     motd = Client.recv(512).replace("\n", "\n\t\t")
 
@@ -881,17 +2707,39 @@ class Miner:
                              + Style.NORMAL + f' (connection err: {e})',
                              'error', 'net0')
                 retry_count += 1
-                sleep(10)
+                attempts += 1
+                reconnect = True
 
     def mine(id: int, user_settings: list,
-             blocks: int, pool: tuple,
-             accept: int, reject: int,
-             hashrate: list,
+             counters, pool: tuple,
              single_miner_id: str,
-             print_queue):
+             print_queue,
+             profile: bool = False,
+             tuning: dict = None,
+             rpi_hardware: Hardware = None,
+             governor: Governor = None,
+             status_path: str = None):
         """
         Main section that executes the functionalities from the sections above.
         """
+        global profiler, hardware
+        hardware = rpi_hardware
+        # The supervisor stops workers, Ctrl+C only reaches the main process
+        signal(SIGINT, SIG_IGN)
+        counters.heartbeat[id] = counters.ready[id] = time()
+        Algorithms.engine_args = Algorithms.tuning_args(tuning or {})
+        Algorithms.engine_args.update(Algorithms.job_limits(user_settings))
+        Algorithms.start_kernel(tuning or {})
+        native_threads = Algorithms.engine_args.get("threads", 1) or cpu_count()
+        active_threads = native_threads
+        if profile:
+            profiler = Profiler(id)
+            profiler.start()
+        if (tuning or {}).get("hybrid") and not Algorithms.start_hybrid(tuning):
+            pretty_print("This libducohasher build has no hybrid engine,"
+                         + f" using the {Algorithms.BACKEND} engine only",
+                         "warning", "sys" + str(id), print_queue=print_queue)
+
         using_algo = get_string("using_algo")
         pretty_print(get_string("mining_thread") + str(id)
                      + get_string("mining_thread_starting")
@@ -900,13 +2748,50 @@ class Miner:
                      + "% " + get_string("efficiency"),
                      "success", "sys"+str(id), print_queue=print_queue)
 
+        capture = None
+        if user_settings.get("capture_jobs", "n") == "y":
+            # One file per worker so processes never share a write position
+            capture = JobCapture(Settings.DATA_DIR + Settings.CAPTURE_DIR
+                                 + f"/jobs_cpu{id}_{single_miner_id}.dcap")
+
+        status = None
+        if status_path:
+            status = StatusFile.attach(status_path, counters.workers)
+
         last_report = time()
         r_shares, last_shares = 0, 0
+        show_shares = Miner.share_lines_enabled(user_settings,
+                                                counters.workers)
+
+        auto_diff = user_settings["auto_diff"] == "y"
+        band = DifficultyTiers.parse_band(user_settings["share_time_band"])
+        tier = DifficultyTiers.index(user_settings["start_diff"])
+        counters.stats.tier[id] = tier
+        # Without auto_diff the configured name goes to the node as is,
+        # tiers it doesn't know included
+        requested_diff = (Settings.DIFF_TIERS[tier] if auto_diff
+                          else user_settings["start_diff"])
+        # Last difficulty the node sent for each tier
+        tier_diffs = [0] * len(Settings.DIFF_TIERS)
+        tier_from = counters.stats.recorded[id]
+
+        # Network incident in progress: (kind, start time)
+        incident = None
+        socket_retries = 0
+        # Jobs abandoned in a row, each waits longer before reconnecting
+        abandons = 0
         while True:
-            accept.value = 0
-            reject.value = 0
+            counters.accept[id] = 0
+            counters.reject[id] = 0
             try:
-                Miner.m_connect(id, pool)
+                # Reconnects skip the MOTD and start after a short jitter
+                Miner.m_connect(id, pool, quiet=bool(incident),
+                                counters=counters,
+                                reconnect=bool(incident))
+                node = s.getpeername()[:2]
+                if status:
+                    status.update_worker(id, 0, 0, counters.blocks[id], 0,
+                                         0, 0, 0, node)
                 while True:
                     try:
                         if user_settings["mining_key"] != "None":   
@@ -925,33 +2810,114 @@ class Miner:
                                         + Settings.SEPARATOR
                                         + str(user_settings["username"])
                                         + Settings.SEPARATOR
-                                        + str(user_settings["start_diff"])
+                                        + requested_diff
                                         + Settings.SEPARATOR
                                         + str(key)
                                         + Settings.SEPARATOR
                                         + str(raspi_iot_reading))
 
                             job = Client.recv().split(Settings.SEPARATOR)
+                            counters.heartbeat[id] = time()
                             if len(job) == 3:
+                                int(job[2])
+                                if capture:
+                                    capture.record(job[0], job[1], int(job[2]))
                                 break
                             else:
+                                # The node is refusing jobs for now,
+                                # asking again on this connection is enough
+                                if not incident:
+                                    incident = ("message", time())
+                                    counters.incidents[id] += 1
                                 pretty_print(
-                                    "Node message: " + str(job[1]),
+                                    "Node message: "
+                                    + str(job[-1] if len(job) > 1 else job[0]),
                                     "warning", print_queue=print_queue)
-                                sleep(3)
-
-                        job_mul = user_settings.get("job_mul", 100)
+                                sleep(Client.backoff(socket_retries + 2))
+                                socket_retries += 1
+
+                        if incident:
+                            down = time() - incident[1]
+                            counters.downtime[id] += down
+                            pretty_print(f"Recovered from {incident[0]}"
+                                         + f" in {down:.1f}s", "success",
+                                         "net" + str(id),
+                                         print_queue=print_queue)
+                            incident = None
+                        socket_retries = 0
+
+                        search_diff, job_mul = Algorithms.search_range(
+                            int(job[2]), int(user_settings["job_mul"]),
+                            int(user_settings["max_range"]))
 
                         while True:
                             time_start = time()
                             back_color = Back.YELLOW
 
+                            if governor and Algorithms.BACKEND != "gpu":
+                                active_threads = governor.active_threads(
+                                    native_threads)
+                                Algorithms.engine_args["threads"] = active_threads
+
                             result = Algorithms.DUCOS1(
-                                job[0], job[1], int(job[2]), job_mul)
+                                job[0], job[1], search_diff, job_mul)
                             computetime = time() - time_start
+                            counters.heartbeat[id] = time()
+
+                            counters.stats.record(id, result[2], time_start,
+                                                  time_start + computetime)
+                            total_hashrate = counters.stats.ewma_total()
+
+                            tier_diffs[tier] = int(job[2])
+                            if (auto_diff and counters.stats.recorded[id]
+                                    - tier_from >= Settings.TIER_MIN_JOBS):
+                                share_time = counters.stats.median_since(
+                                    id, tier_from)
+                                new_tier = DifficultyTiers.choose(
+                                    tier, share_time, band, int(job[2]),
+                                    tier_diffs)
+                                if new_tier != tier:
+                                    pretty_print(
+                                        "Difficulty "
+                                        + Settings.DIFF_TIERS[tier] + " → "
+                                        + Settings.DIFF_TIERS[new_tier]
+                                        + " (median share time"
+                                        + f" {share_time:.1f}s, target"
+                                        + f" {band[0]:g}-{band[1]:g}s)",
+                                        "info", "cpu" + str(id),
+                                        print_queue=print_queue)
+                                    counters.stats.switch_tier(id, new_tier)
+                                    tier = new_tier
+                                    requested_diff = Settings.DIFF_TIERS[tier]
+                                tier_from = counters.stats.recorded[id]
+
+                            if (result[0] == 0 and not
+                                    Algorithms.check_nonce(job[0], job[1], 0)):
+                                # Timed out or searched the whole range:
+                                # submitting 0 would only earn a rejection
+                                counters.aborts[id] += 1
+                                reason = "exhausted"
+                                if computetime >= Algorithms.engine_args.get(
+                                        "timeout", computetime + 1):
+                                    reason = "timed out"
+                                pretty_print(f"Abandoned diff {job[2]} job"
+                                             + f" ({reason} after"
+                                             + f" {computetime:.1f}s),"
+                                             + " fetching a new one",
+                                             "warning", "cpu" + str(id),
+                                             print_queue=print_queue)
+                                # The node waits for a result on this
+                                # socket, a new connection gets a new job
+                                s.close()
+                                Miner.m_connect(id, pool, quiet=True,
+                                                counters=counters,
+                                                reconnect=True,
+                                                attempts=abandons)
+                                abandons += 1
+                                node = s.getpeername()[:2]
+                                break
+                            abandons = 0
 
-                            hashrate[id] = result[1]
-                            total_hashrate = sum(hashrate.values())
                             prep_identifier = user_settings['identifier']
                             if running_on_rpi:
                                 if prep_identifier != "None":
@@ -975,66 +2941,117 @@ class Miner:
                                 time_start = time()
                                 feedback = Client.recv().split(Settings.SEPARATOR)
                                 ping = (time() - time_start) * 1000
+                                counters.heartbeat[id] = time()
+
+                                if hardware:
+                                    hardware.blink("red" if feedback[0] == "BAD"
+                                                   else "green")
 
                                 if feedback[0] == "GOOD":
-                                    accept.value += 1
-                                    share_print(id, "accept",
-                                                accept.value, reject.value,
-                                                hashrate[id],total_hashrate,
-                                                computetime, job[2], ping,
-                                                back_color,
-                                                print_queue=print_queue)
+                                    counters.accept[id] += 1
+                                    accepted, rejected = counters.totals()
+                                    if show_shares:
+                                        share_print(id, "accept",
+                                                    accepted, rejected,
+                                                    counters.stats.ewma[id], total_hashrate,
+                                                    computetime, job[2], ping,
+                                                    back_color,
+                                                    print_queue=print_queue,
+                                                    share_times=counters.stats.share_times(id=id))
 
                                 elif feedback[0] == "BLOCK":
-                                    accept.value += 1
-                                    blocks.value += 1
-                                    share_print(id, "block",
-                                                accept.value, reject.value,
-                                                hashrate[id],total_hashrate,
-                                                computetime, job[2], ping,
-                                                back_color,
-                                                print_queue=print_queue)
+                                    counters.accept[id] += 1
+                                    counters.blocks[id] += 1
+                                    accepted, rejected = counters.totals()
+                                    if show_shares:
+                                        share_print(id, "block",
+                                                    accepted, rejected,
+                                                    counters.stats.ewma[id], total_hashrate,
+                                                    computetime, job[2], ping,
+                                                    back_color,
+                                                    print_queue=print_queue,
+                                                    share_times=counters.stats.share_times(id=id))
 
                                 elif feedback[0] == "BAD":
-                                    reject.value += 1
-                                    share_print(id, "reject",
-                                                accept.value, reject.value,
-                                                hashrate[id], total_hashrate,
-                                                computetime, job[2], ping,
-                                                back_color, feedback[1],
-                                                print_queue=print_queue)
-
-                                if accept.value % 100 == 0 and accept.value > 1:
+                                    counters.reject[id] += 1
+                                    accepted, rejected = counters.totals()
+                                    if show_shares:
+                                        share_print(id, "reject",
+                                                    accepted, rejected,
+                                                    counters.stats.ewma[id], total_hashrate,
+                                                    computetime, job[2], ping,
+                                                    back_color, feedback[1],
+                                                    print_queue=print_queue,
+                                                    share_times=counters.stats.share_times(id=id))
+
+                                accepted, rejected = counters.totals()
+                                if (feedback[0] != "BAD" and accepted % 100 == 0
+                                        and accepted > 1):
                                     pretty_print(
-                                        f"{get_string('surpassed')} {accept.value} {get_string('surpassed_shares')}",
+                                        f"{get_string('surpassed')} {accepted} {get_string('surpassed_shares')}",
                                         "success", "sys0", print_queue=print_queue)
 
-                                title(get_string('duco_python_miner') + str(Settings.VER)
-                                      + f') - {accept.value}/{(accept.value + reject.value)}'
-                                      + get_string('accepted_shares'))
+                                if status:
+                                    status.update_worker(
+                                        id, counters.accept[id],
+                                        counters.reject[id],
+                                        counters.blocks[id], job[2],
+                                        counters.stats.ewma[id],
+                                        computetime, ping, node)
 
                                 if id == 0:
                                     end_time = time()
                                     elapsed_time = end_time - last_report
                                     if elapsed_time >= int(user_settings["report_sec"]):
-                                        r_shares = accept.value - last_shares
+                                        r_shares = accepted - last_shares
                                         uptime = calculate_uptime(
                                             mining_start_time)
                                         periodic_report(last_report, end_time,
-                                                        r_shares, blocks.value,
-                                                        sum(hashrate.values()),
-                                                        uptime)
+                                                        r_shares, sum(counters.blocks),
+                                                        counters.stats.moving_average(elapsed_time),
+                                                        uptime,
+                                                        counters.stats.share_times(elapsed_time),
+                                                        sum(counters.aborts))
+                                        if Algorithms.hybrid:
+                                            pretty_print(
+                                                Algorithms.hybrid_summary(),
+                                                "info", "sys0",
+                                                print_queue=print_queue)
                                         last_report = time()
-                                        last_shares = accept.value
+                                        last_shares = accepted
+
+                                if governor:
+                                    governor.pause(computetime, native_threads,
+                                                   active_threads,
+                                                   counters.heartbeat, id)
                                 break
                             break
                     except Exception as e:
+                        kind = Client.classify(e)
+                        if not incident:
+                            incident = (kind, time())
+                            counters.incidents[id] += 1
+                        if (kind == "parse"
+                                and socket_retries < Settings.SOCKET_RETRIES):
+                            # The connection works: drop the rest of the
+                            # bad reply and ask for a new job on it
+                            socket_retries += 1
+                            pretty_print(f"Malformed reply ({e}), requesting"
+                                         + " a new job", "warning",
+                                         "net" + str(id),
+                                         print_queue=print_queue)
+                            Client.drain()
+                            continue
                         pretty_print(get_string("error_while_mining")
-                                     + " " + str(e), "error", "net" + str(id),
+                                     + f" {e} ({kind}), reconnecting",
+                                     "error", "net" + str(id),
                                      print_queue=print_queue)
-                        sleep(5)
+                        s.close()
                         break
             except Exception as e:
+                if not incident:
+                    incident = (Client.classify(e), time())
+                    counters.incidents[id] += 1
                 pretty_print(get_string("error_while_mining")
                                      + " " + str(e), "error", "net" + str(id),
                                      print_queue=print_queue)
@@ -1042,12 +3059,23 @@ class Miner:
 
 
 Miner.preload()
-p_list = []
 mining_start_time = time()
 
 if __name__ == "__main__":
     from multiprocessing import freeze_support
     freeze_support()
+
+    parser = argparse.ArgumentParser(description="Duino-Coin PC Miner")
+    parser.add_argument("--profile", action="store_true",
+                        help="sample every worker and write collapsed stacks to "
+                             + Settings.DATA_DIR + Settings.PROFILE_DIR)
+    parser.add_argument("--calibrate", action="store_true",
+                        help="measure the fastest worker and native thread "
+                             + "setup and save it for this CPU")
+    parser.add_argument("--agent", metavar="HOST:PORT",
+                        help="take the settings and node from a fleet "
+                             + "controller and report stats to it")
+    args = parser.parse_args()
     signal(SIGINT, handler)
     title(f"{get_string('duco_python_miner')}{str(Settings.VER)})")
 
@@ -1055,12 +3083,17 @@ if __name__ == "__main__":
         os.system('') # Enable VT100 Escape Sequence for WINDOWS 10 Ver. 1607
 
     cpu = cpuinfo.get_cpu_info()
-    accept = Manager().Value("i", 0)
-    reject = Manager().Value("i", 0)
-    blocks = Manager().Value("i", 0)
-    hashrate = Manager().dict()
-    print_queue = Manager().list()
-    Thread(target=print_queue_handler, args=[print_queue]).start()
+    print_queue = Queue()
+    renderer = Renderer()
+    Thread(target=renderer.run, args=[print_queue]).start()
+
+    agent = None
+    if args.agent:
+        agent = Agent(args.agent)
+        agent.configure()
+        pretty_print(f"Configured by fleet controller {args.agent}"
+                     + (f", node {agent.node[0]}:{agent.node[1]}"
+                        if agent.node else ""), "success", "net0")
 
     user_settings = Miner.load_cfg()
     Miner.greeting()
@@ -1069,6 +3102,59 @@ if __name__ == "__main__":
         user_settings["raspi_leds"] = "y"
     if not "raspi_cpu_iot" in user_settings:
         user_settings["raspi_cpu_iot"] = "y"
+    if not "capture_jobs" in user_settings:
+        user_settings["capture_jobs"] = Settings.CAPTURE_JOBS
+    if not "affinity" in user_settings:
+        user_settings["affinity"] = Settings.AFFINITY
+    if not "job_mul" in user_settings:
+        user_settings["job_mul"] = str(Settings.JOB_MUL)
+    if not "native_threads" in user_settings:
+        user_settings["native_threads"] = str(Settings.NATIVE_THREADS)
+    if not "gpu_chunk" in user_settings:
+        user_settings["gpu_chunk"] = str(Settings.GPU_CHUNK)
+    if not "hybrid" in user_settings:
+        user_settings["hybrid"] = Settings.HYBRID
+    if not "job_timeout" in user_settings:
+        user_settings["job_timeout"] = str(Settings.JOB_TIMEOUT)
+    if not "max_range" in user_settings:
+        user_settings["max_range"] = str(Settings.MAX_RANGE)
+    if not "auto_diff" in user_settings:
+        user_settings["auto_diff"] = Settings.AUTO_DIFF
+    if not "share_time_band" in user_settings:
+        user_settings["share_time_band"] = Settings.SHARE_TIME_BAND
+    if not "opencl_device" in user_settings:
+        user_settings["opencl_device"] = Settings.OPENCL_DEVICE
+    if not "hybrid_cpu_diff" in user_settings:
+        user_settings["hybrid_cpu_diff"] = str(Settings.HYBRID_CPU_DIFF)
+    if not "share_lines" in user_settings:
+        user_settings["share_lines"] = Settings.SHARE_LINES
+    if not "status_file" in user_settings:
+        user_settings["status_file"] = Settings.STATUS_FILE
+    if not "governor" in user_settings:
+        user_settings["governor"] = Settings.GOVERNOR
+    if not "target_temp" in user_settings:
+        user_settings["target_temp"] = str(Settings.TARGET_TEMP)
+    if not "power_budget" in user_settings:
+        user_settings["power_budget"] = str(Settings.POWER_BUDGET)
+
+    if user_settings["capture_jobs"] == "y":
+        if not Path(Settings.DATA_DIR + Settings.CAPTURE_DIR).is_dir():
+            mkdir(Settings.DATA_DIR + Settings.CAPTURE_DIR)
+        pretty_print("Capturing received jobs to "
+                     + Settings.DATA_DIR + Settings.CAPTURE_DIR, "info")
+
+    if args.profile:
+        if not Path(Settings.DATA_DIR + Settings.PROFILE_DIR).is_dir():
+            mkdir(Settings.DATA_DIR + Settings.PROFILE_DIR)
+        pretty_print("Profiling workers, stacks are written to "
+                     + Settings.DATA_DIR + Settings.PROFILE_DIR
+                     + f" every {Settings.PROFILE_DUMP_TIME}s", "info")
+
+    if Algorithms.BACKEND == "python":
+        pretty_print("libducohasher is missing: mining on the pure-Python"
+                     + " fallback engine, expect a small fraction of the"
+                     + " native hashrate. native_threads sets how many"
+                     + " processes share each job", "warning")
     
     if user_settings["raspi_leds"] == "y":
         try:
@@ -1099,9 +3185,16 @@ if __name__ == "__main__":
         except Exception as e:
             print(e)
             user_settings["raspi_cpu_iot"] = "n"
+
+    if running_on_rpi:
+        hardware = Hardware(user_settings["raspi_leds"] == "y",
+                            user_settings["raspi_cpu_iot"] == "y")
+        hardware.start()
     
     try:
-        check_mining_key(user_settings)
+        # The controller already vouches for the keys it pushes
+        if not agent:
+            check_mining_key(user_settings)
     except Exception as e:
         print("Error checking mining key:", e)
 
@@ -1114,27 +3207,162 @@ if __name__ == "__main__":
     """
     single_miner_id = randint(0, 2811)
 
-    threads = int(user_settings["threads"])
-    if threads > 16:
-        threads = 16
-        pretty_print(Style.BRIGHT
-                     + get_string("max_threads_notice"))
+    affinity = user_settings["affinity"]
+    if affinity not in Topology.POLICIES:
+        pretty_print(f"Unknown affinity policy {affinity}, expected one of "
+                     + ", ".join(Topology.POLICIES), "warning")
+        affinity = "none"
+    cpus = Topology.detect()
+
+    kernel = None
+    if hasattr(libducohasher, "tune_kernel"):
+        # Tuned once per OpenCL device, --calibrate tunes again
+        device = user_settings["opencl_device"]
+        kernel = Calibration.load_kernel(device)
+        if kernel is None or args.calibrate:
+            pretty_print(f"Tuning the OpenCL kernel for the {device} device",
+                         "info")
+            result = Calibration.tune_kernel(device)
+            Calibration.save_kernel(device, result)
+            kernel = (result["nonces_per_item"], result["work_group"])
+            if "failed" not in result:
+                pretty_print(f"{result['device']}: {kernel[0]} nonces per"
+                             + " work-item, work-group "
+                             + (str(kernel[1]) if kernel[1] else "auto")
+                             + f" ({get_prefix('H/s', result['hashrate'], 2)})",
+                             "success")
+
+    cpu_name = Calibration.cpu_name(cpu)
+    tuning = Calibration.load(cpu_name)
+    if agent and tuning and not args.calibrate:
+        # The controller balances nodes by the threads it pushed
+        pretty_print(f"Ignoring the saved calibration for {cpu_name}:"
+                     + " the fleet controller sets the threads", "info")
+        tuning = None
+    if args.calibrate:
+        tuning = Calibration.run(cpus, affinity,
+                                 {"kernel": kernel,
+                                  "opencl_device": user_settings["opencl_device"]})
+        Calibration.save(cpu_name, tuning)
+        pretty_print(get_string("config_saved") + " "
+                     + Calibration.section(cpu_name), "success")
+
+    if tuning:
+        threads = tuning["threads"]
+        pretty_print(f"Using calibration for {cpu_name}: {threads} workers x "
+                     + f"{tuning['native_threads']} native threads"
+                     + (f", chunk {tuning['gpu_chunk']}"
+                        if tuning["gpu_chunk"] else "")
+                     + f", job_mul {user_settings['job_mul']}"
+                     + f" ({get_prefix('H/s', tuning['hashrate'], 2)})",
+                     "info")
+    else:
+        threads = int(user_settings["threads"])
+        tuning = {"native_threads": int(user_settings["native_threads"]),
+                  "gpu_chunk": int(user_settings["gpu_chunk"])}
+    tuning["opencl_device"] = user_settings["opencl_device"]
+    tuning["kernel"] = kernel
+    tuning["hybrid"] = user_settings["hybrid"] == "y"
+    tuning["hybrid_cpu_diff"] = int(user_settings["hybrid_cpu_diff"])
+    if tuning["hybrid"]:
+        pretty_print("Hybrid engine: jobs up to difficulty "
+                     + f"{tuning['hybrid_cpu_diff']} stay on the CPU, larger"
+                     + f" ones are split with the {tuning['opencl_device']}"
+                     + " OpenCL device by measured speed", "info")
+
     if threads > cpu_count():
         pretty_print(Style.BRIGHT
                      + get_string("system_threads_notice"),
                      "warning")
         sleep(10)
 
-    fastest_pool = Client.fetch_pool()
-
-    for i in range(threads):
-        p = Process(target=Miner.mine,
-                    args=[i, user_settings, blocks,
-                          fastest_pool, accept, reject,
-                          hashrate, single_miner_id, 
-                          print_queue])
-        p_list.append(p)
-        p.start()
-
-    for p in p_list:
-        p.join()
+    per_worker = 1
+    if Algorithms.BACKEND != "gpu" or tuning["hybrid"]:
+        per_worker = max(1, tuning["native_threads"])
+    placement = Topology.plan(cpus, affinity, threads, per_worker)
+    if affinity != "none":
+        pretty_print(f"Pinning {threads} workers ({affinity})", "info")
+        debug_output("Placement: " + ", ".join(
+            f"cpu{i}→" + ",".join(map(str, cpu_set))
+            for i, cpu_set in enumerate(placement)))
+
+    if agent and agent.node:
+        fastest_pool = agent.node
+    else:
+        fastest_pool = Client.fetch_pool()
+
+    session_configs = Scheduler.load_sessions(user_settings, threads)
+    status = None
+    if user_settings["status_file"] == "y":
+        if not Path(Settings.DATA_DIR + Settings.STATUS_DIR).is_dir():
+            mkdir(Settings.DATA_DIR + Settings.STATUS_DIR)
+        status_path = (Settings.DATA_DIR + Settings.STATUS_DIR
+                       + f"/miner_{os.getpid()}.status")
+        rows = threads
+        if len(session_configs) > 1:
+            rows = sum(config.connections for config in session_configs)
+        status = StatusFile.create(status_path, rows, os.getpid(),
+                                   user_settings["username"],
+                                   user_settings["identifier"],
+                                   Algorithms.BACKEND)
+
+    if len(session_configs) > 1:
+        # Several accounts: one process, shared executors instead of a fleet
+        Algorithms.engine_args = Algorithms.tuning_args(tuning)
+        Algorithms.engine_args.update(Algorithms.job_limits(user_settings))
+        Algorithms.start_kernel(tuning)
+        if tuning["hybrid"]:
+            Algorithms.start_hybrid(tuning)
+        scheduler = Scheduler(session_configs, threads,
+                              int(user_settings["job_mul"]),
+                              {"auto": fastest_pool},
+                              int(user_settings["max_range"]))
+        pretty_print(f"Scheduler: {len(session_configs)} accounts,"
+                     + f" {len(scheduler.sessions)} connections on {threads}"
+                     + f" executors x {tuning['native_threads']} native threads",
+                     "info")
+        scheduler.status = status
+        renderer.totals = lambda: (
+            sum(session.accepted for session in scheduler.sessions),
+            sum(session.rejected for session in scheduler.sessions))
+        scheduler.start(user_settings, single_miner_id, print_queue)
+        if agent:
+            agent.start(lambda: Agent.scheduler_stats(scheduler))
+        scheduler.watch(print_queue, int(user_settings["report_sec"]))
+
+    counters = Counters(threads)
+    renderer.totals = counters.totals
+
+    governor = None
+    if user_settings["governor"] == "y":
+        # intensity is the highest duty cycle the governor may use
+        governor = Governor(float(user_settings["target_temp"]),
+                            float(user_settings["power_budget"]),
+                            int(user_settings["intensity"]) / 100)
+        governor.start(counters, print_queue,
+                       int(user_settings["report_sec"]))
+        pretty_print(f"Throttle governor: {len(governor.zones)} thermal zones,"
+                     + f" {len(governor.domains)} RAPL domains, duty cycle up"
+                     + f" to {user_settings['intensity']}%", "info")
+    # A job may legally run for job_timeout, hangs are only detected
+    # when jobs are bounded
+    hang_after = 0
+    if float(user_settings["job_timeout"]) > 0:
+        hang_after = (float(user_settings["job_timeout"])
+                      + Settings.HEARTBEAT_TIMEOUT)
+    fleet = Fleet(threads, Miner.mine,
+                  lambda id: [id, user_settings, counters,
+                              fastest_pool, single_miner_id,
+                              print_queue, args.profile, tuning,
+                              hardware, governor, status_path],
+                  placement, counters, hang_after)
+    fleet.start()
+    if agent:
+        agent.start(lambda: Agent.fleet_stats(counters))
+
+    show_shares = Miner.share_lines_enabled(user_settings, threads)
+    if not show_shares:
+        pretty_print(f"{threads} workers, share lines hidden: printing a "
+                     + f"summary every {Settings.SUMMARY_TIME}s", "info")
+    fleet.watch(counters, print_queue, show_summary=not show_shares,
+                status=status)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Batch hash API benchmark
+
+Hashes the same nonces with DUCOHasher.hash_range / hash_nonces into
+a preallocated buffer and with a hashlib loop, checks that every
+digest matches and reports the rate of each.
+
+Usage (from the repository root, next to libducohasher):
+    python3 benchmarks/batch_hash.py --count 1000000 --threads 0
+"""
+
+from time import perf_counter
+from array import array
+from pathlib import Path
+import argparse
+import hashlib
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import libducohasher
+from PC_Miner import get_prefix
+
+DIGEST_SIZE = 20
+
+
+def hashlib_digests(base: bytes, nonces) -> bytearray:
+    prefix = hashlib.sha1(base)
+    out = bytearray()
+    for nonce in nonces:
+        h = prefix.copy()
+        h.update(str(nonce).encode("ascii"))
+        out += h.digest()
+    return out
+
+
+def timed(function, *args):
+    start = perf_counter()
+    result = function(*args)
+    return result, perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch hash API benchmark")
+    parser.add_argument("--count", type=int, default=1_000_000)
+    parser.add_argument("--start", type=int, default=0,
+                        help="first nonce of the range")
+    parser.add_argument("--threads", type=int, default=1,
+                        help="native threads, 0 uses every CPU")
+    parser.add_argument("--base", default="a" * 40,
+                        help="job base string (last block hash)")
+    args = parser.parse_args()
+
+    hasher = libducohasher.DUCOHasher(args.base.encode("ascii"))
+    if not hasattr(hasher, "hash_range"):
+        print("This libducohasher build has no batch hash API")
+        return 1
+
+    out = bytearray(args.count * DIGEST_SIZE)
+    _, range_time = timed(hasher.hash_range, out, args.start, args.threads)
+
+    # Reversed so hash_nonces can't pass by matching the range order
+    nonces = array("Q", reversed(range(args.start, args.start + args.count)))
+    scattered = bytearray(args.count * DIGEST_SIZE)
+    _, nonces_time = timed(hasher.hash_nonces, nonces, scattered, args.threads)
+
+    expected, hashlib_time = timed(
+        hashlib_digests, args.base.encode("ascii"),
+        range(args.start, args.start + args.count))
+
+    reordered = bytearray().join(
+        scattered[i * DIGEST_SIZE:(i + 1) * DIGEST_SIZE]
+        for i in reversed(range(args.count)))
+    ok = out == expected and reordered == expected
+
+    for name, elapsed in (("hash_range", range_time),
+                          ("hash_nonces", nonces_time),
+                          ("hashlib loop", hashlib_time)):
+        rate = args.count / max(elapsed, 1e-9)
+        print(f"{name:>13}: {elapsed:8.3f}s {get_prefix('H/s', rate, 2):>12}"
+              + f" ({hashlib_time / max(elapsed, 1e-9):.1f}x hashlib)")
+    print(f"digests match: {'yes' if ok else 'NO'}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
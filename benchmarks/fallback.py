@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Pure-Python fallback engine benchmark
+
+Runs full-range searches (unreachable target) on the native
+libducohasher, when it can be imported, and on pyducohasher with
+1 and N processes per job, and reports how far the fallback is
+from the native engine. Also checks that a job abandoned on timeout
+reports only the nonces it hashed, not its whole range.
+
+Usage (from the repository root, next to libducohasher):
+    python3 benchmarks/fallback.py --diff 5000 --threads 4
+"""
+
+from time import perf_counter
+from multiprocessing import cpu_count
+from pathlib import Path
+import argparse
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import pyducohasher
+from PC_Miner import get_prefix
+
+
+def measure(module, diff: int, job_mul: int, threads: int,
+            duration: float) -> float:
+    """
+    Hashrate of repeated full scans over duration seconds
+    """
+    hasher = module.DUCOHasher(b"a" * 40)
+    kwargs = {"threads": threads} if threads != 1 else {}
+    hashes, start = 0, perf_counter()
+    while perf_counter() - start < duration:
+        hashes += hasher.DUCOS1(bytes(20), diff, job_mul, **kwargs)[1]
+    return hashes / (perf_counter() - start)
+
+
+def timeout_hashed(module, threads: int, timeout: float) -> tuple:
+    """
+    (nonce, hashed, seconds) of a job far too large to finish in time
+    """
+    hasher = module.DUCOHasher(b"a" * 40)
+    kwargs = {"threads": threads} if threads != 1 else {}
+    start = perf_counter()
+    nonce, hashed = hasher.DUCOS1(bytes(20), 10**9, 100, timeout=timeout,
+                                  **kwargs)
+    return nonce, hashed, perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Pure-Python fallback engine benchmark")
+    parser.add_argument("--diff", type=int, default=5000)
+    parser.add_argument("--job-mul", type=int, default=100)
+    parser.add_argument("--threads", type=int, default=cpu_count(),
+                        help="processes per job for the pooled run")
+    parser.add_argument("--duration", type=float, default=5)
+    args = parser.parse_args()
+
+    engines = []
+    try:
+        import libducohasher
+        engines.append(("native", libducohasher))
+    except ImportError:
+        print("libducohasher not found, only the fallback is measured")
+    engines.append(("python", pyducohasher))
+
+    results = {}
+    for name, module in engines:
+        for threads in sorted({1, args.threads}):
+            rate = measure(module, args.diff, args.job_mul, threads,
+                           args.duration)
+            results[(name, threads)] = rate
+
+    print(f"{'engine':>8} {'threads':>8} {'hashrate':>12} {'vs native':>10}")
+    for (name, threads), rate in results.items():
+        native = results.get(("native", threads))
+        ratio = f"{rate / native * 100:.1f}%" if native else "-"
+        print(f"{name:>8} {threads:>8} {get_prefix('H/s', rate, 2):>12}"
+              + f" {ratio:>10}")
+
+    ok = True
+    for (name, threads), rate in results.items():
+        module = dict(engines)[name]
+        nonce, hashed, elapsed = timeout_hashed(module, threads, 0.5)
+        # A timed-out job must not claim more than it could have hashed
+        if nonce != 0 or hashed > rate * elapsed * 2:
+            print(f"{name} x{threads}: timed-out job reported {hashed}"
+                  + f" hashes in {elapsed:.2f}s")
+            ok = False
+    print(f"timeout accounting: {'ok' if ok else 'WRONG'}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
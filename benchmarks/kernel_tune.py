@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+OpenCL kernel autotuner check
+
+Tunes the specialised kernel (nonces per work-item, work-group size)
+on one OpenCL device, then searches nonces placed at digit-count
+boundaries and inside batches with every nonces-per-work-item value,
+so a wrong decimal counter or batch split shows up as a missed nonce.
+Works on CPU OpenCL implementations such as pocl.
+
+Usage (from the repository root, next to the GPU libducohasher):
+    python3 benchmarks/kernel_tune.py --device cpu
+"""
+
+from time import perf_counter
+from pathlib import Path
+import argparse
+import hashlib
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import libducohasher
+from PC_Miner import get_prefix
+
+NONCES_PER_ITEM = (1, 2, 4, 8, 16, 32)
+# Nonces around the points where the digit count changes and around
+# the first launch boundary of the default chunk. 0 is left out: it is
+# also what a search that found nothing returns
+TARGETS = (1, 9, 10, 99_999, 100_000, 123_457, 131_071, 131_072, 999_999,
+           1_000_000, 4_999_999)
+
+
+def search(base: str, nonce: int, device: str, chunk: int) -> int:
+    expected = hashlib.sha1(f"{base}{nonce}".encode("ascii")).digest()
+    hasher = libducohasher.DUCOHasher(base.encode("ascii"))
+    return hasher.DUCOS1(expected, 50_000, 100, chunk, device)[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenCL kernel autotuner")
+    parser.add_argument("--device", default="any",
+                        help="any, gpu, cpu or accelerator")
+    parser.add_argument("--chunk", type=int, default=131_072,
+                        help="nonces per kernel launch")
+    parser.add_argument("--trial", type=float, default=0.25,
+                        help="seconds measured per setup")
+    parser.add_argument("--base", default="a" * 40,
+                        help="job base string (last block hash)")
+    args = parser.parse_args()
+
+    if not hasattr(libducohasher, "tune_kernel"):
+        print("This libducohasher build has no OpenCL kernel tuning")
+        return 1
+
+    start = perf_counter()
+    name, nonces_per_item, work_group, rate = libducohasher.tune_kernel(
+        args.device, args.chunk, args.trial)
+    print(f"{name}: best {nonces_per_item} nonces per work-item, work-group"
+          + f" {work_group or 'auto'}, {get_prefix('H/s', rate, 2)}"
+          + f" (tuned in {perf_counter() - start:.1f}s)")
+
+    failed = 0
+    for k in NONCES_PER_ITEM:
+        libducohasher.set_kernel(args.device, k, work_group)
+        for nonce in TARGETS:
+            found = search(args.base, nonce, args.device, args.chunk)
+            if found != nonce:
+                print(f"K={k}: expected {nonce}, found {found}")
+                failed += 1
+    libducohasher.set_kernel(args.device, nonces_per_item, work_group)
+    print(f"nonces found: {'all' if not failed else f'{failed} missed'}")
+    return 0 if not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Share line rendering benchmark
+
+Reports the per-share cost of the old worker-side formatting (nested
+language lookups, prefixes and string building on every share), of
+what a worker pays now (one record on the print queue) and of the
+main process rendering that record with the precompiled templates,
+and checks that both produce the same line. Each figure is the best of
+--repeat runs.
+
+Usage (from the repository root):
+    python3 benchmarks/render.py --count 100000 --repeat 5
+"""
+
+from multiprocessing import Queue
+from time import perf_counter
+from pathlib import Path
+import argparse
+import sys
+
+from colorama import Back, Fore, Style
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import PC_Miner
+from PC_Miner import Renderer, Settings, get_prefix, share_print
+
+CLOCK = "12:34:56"
+TYPES = ("accept", "accept", "accept", "block", "reject")
+
+
+def lookup(name: str) -> str:
+    """
+    get_string as it was: two nested dict lookups per call
+    """
+    lang_file, lang = PC_Miner.lang_file, PC_Miner.lang
+    if name in lang_file[lang]:
+        return lang_file[lang][name]
+    elif name in lang_file["english"]:
+        return lang_file["english"][name]
+    return name
+
+
+def legacy_share_line(id, type, accept, reject, thread_hashrate,
+                      total_hashrate, computetime, diff, ping, back_color,
+                      reject_cause=None, share_times=None) -> str:
+    """
+    The share line as workers used to build it for every share
+    """
+    share_time_str = ""
+    if share_times:
+        share_time_str = (Style.DIM + f" (p50 {share_times[0]:.1f}s"
+                          + f" p95 {share_times[1]:.1f}s)" + Style.NORMAL)
+    thread_hashrate = get_prefix("H/s", thread_hashrate, 2)
+    total_hashrate = get_prefix("H/s", total_hashrate, 1)
+    diff = get_prefix("", int(diff), 0)
+    if type == "accept":
+        share_str = lookup("accepted")
+        fg_color = Fore.GREEN
+    elif type == "block":
+        share_str = lookup("block_found")
+        fg_color = Fore.YELLOW
+    else:
+        share_str = lookup("rejected")
+        if reject_cause:
+            share_str += f"{Style.NORMAL}({reject_cause}) "
+        fg_color = Fore.RED
+    return (Fore.WHITE + Style.DIM + CLOCK + " "
+            + Style.RESET_ALL + Fore.WHITE + Style.BRIGHT + back_color
+            + f" cpu{id} " + Back.RESET + fg_color + Settings.PICK
+            + share_str + Fore.RESET + f"{accept}/{(accept + reject)}"
+            + Fore.YELLOW
+            + f" ({(round(accept / (accept + reject) * 100))}%)"
+            + Style.NORMAL + Fore.RESET
+            + f" ∙ {('%04.1f' % float(computetime))}s" + share_time_str
+            + Style.NORMAL + " ∙ " + Fore.BLUE + Style.BRIGHT
+            + f"{thread_hashrate}" + Style.DIM
+            + f" ({total_hashrate} {lookup('hashrate_total')})"
+            + Fore.RESET + Style.NORMAL
+            + Settings.COG + f" {lookup('diff')} {diff} ∙ " + Fore.CYAN
+            + f"ping {(int(ping))}ms")
+
+
+def shares(count: int) -> list:
+    return [(n % 16, TYPES[n % len(TYPES)], n + 1, n // 50,
+             750_000 + n % 1000 * 1.5, 12_000_000 + n * 3.0,
+             (n % 90) / 7, 1_000 * (n % 64 + 1), n % 120,
+             Back.YELLOW, "Wrong nonce" if n % 2 else None,
+             (n % 30 / 3, n % 50 / 2) if n % 3 else None)
+            for n in range(count)]
+
+
+class ListQueue(list):
+    put = list.append
+
+
+def timed(function, items, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = perf_counter()
+        for item in items:
+            function(*item)
+        best = min(best, perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Share rendering benchmark")
+    parser.add_argument("--count", type=int, default=100_000,
+                        help="shares to render")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="runs per measurement, the best is shown")
+    args = parser.parse_args()
+
+    items = shares(args.count)
+    legacy_time = timed(legacy_share_line, items, args.repeat)
+
+    records = ListQueue()
+    record_time = timed(
+        lambda *share: share_print(*share[:11], print_queue=records,
+                                   share_times=share[11]),
+        items, args.repeat)
+    records = records[:args.count]
+
+    # What the put costs through a real queue, with its feeder thread
+    queue = Queue()
+    queue_time = timed(
+        lambda *share: share_print(*share[:11], print_queue=queue,
+                                   share_times=share[11]),
+        items, args.repeat)
+    for _ in range(args.count * args.repeat):
+        queue.get()
+
+    renderer = Renderer()
+    renderer.timestamp = lambda stamp: CLOCK
+    render_time = timed(lambda record: renderer.render(record),
+                        [(record,) for record in records], args.repeat)
+    lines = [renderer.render(record) for record in records]
+
+    ok = lines == [legacy_share_line(*share) for share in items]
+    for name, elapsed in (("old worker formatting", legacy_time),
+                          ("worker record (list)", record_time),
+                          ("worker record (Queue)", queue_time),
+                          ("main process render", render_time)):
+        print(f"{name:>22}: {elapsed / args.count * 1e6:7.2f} µs/share")
+    print(f"lines match: {'yes' if ok else 'NO'}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Worker fleet scaling benchmark
+
+Starts 1, 2, 4 ... N workers through the miner's Fleet with the same
+shared-memory counters and per-share bookkeeping as Miner.mine, but on
+synthetic jobs instead of a pool connection, and reports hashrate,
+scaling efficiency and memory per worker.
+
+Usage (from the repository root, next to libducohasher):
+    python3 benchmarks/scaling.py --max-workers 128 --affinity cores
+"""
+
+from time import time, sleep
+from random import Random
+from pathlib import Path
+import argparse
+import hashlib
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from PC_Miner import (Algorithms, Counters, Fleet, Topology,
+                      get_prefix)
+from multiprocessing import Array, cpu_count
+
+
+def bench_worker(id: int, counters, hashes, diff: int, tuning: dict):
+    Algorithms.engine_args = Algorithms.tuning_args(tuning)
+    rng = Random(id)
+    while True:
+        base = hashlib.sha1(f"{id}-{rng.random()}".encode()).hexdigest()
+        nonce = rng.randrange(diff * 100)
+        expected = hashlib.sha1(f"{base}{nonce}".encode()).hexdigest()
+        start = time()
+        result = Algorithms.DUCOS1(base, expected, diff, 100)
+
+        # Same shared state the miner touches for every share
+        counters.stats.record(id, result[2], start, time())
+        counters.accept[id] += 1
+        counters.totals()
+        counters.stats.ewma_total()
+        counters.stats.share_times(id=id)
+        hashes[id] += result[0] + 1
+
+
+def worker_memory(pid: int) -> int:
+    """
+    Proportional set size in bytes, shared pages split between processes
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def measure(workers: int, args, cpus: list) -> dict:
+    counters = Counters(workers)
+    hashes = Array("d", workers, lock=False)
+    tuning = {"native_threads": args.native_threads, "gpu_chunk": 0}
+    placement = Topology.plan(cpus, args.affinity, workers,
+                              args.native_threads)
+    fleet = Fleet(workers, bench_worker,
+                  lambda id: [id, counters, hashes, args.diff, tuning],
+                  placement)
+
+    started = time()
+    fleet.start(stagger=0)
+    start_time = time() - started
+
+    sleep(args.warmup)
+    hashes_before, time_before = sum(hashes), time()
+    sleep(args.duration)
+    hashes_after, time_after = sum(hashes), time()
+
+    memory = [worker_memory(p.pid) for p in fleet.processes]
+    fleet.stop()
+    return {"workers": workers,
+            "hashrate": (hashes_after - hashes_before) / (time_after - time_before),
+            "start_time": start_time,
+            "memory": sum(memory) / workers}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker fleet scaling benchmark")
+    parser.add_argument("--max-workers", type=int, default=128)
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--warmup", type=float, default=2)
+    parser.add_argument("--diff", type=int, default=2000,
+                        help="difficulty of the synthetic jobs (job_mul 100)")
+    parser.add_argument("--native-threads", type=int, default=1)
+    parser.add_argument("--affinity", default="cores",
+                        choices=Topology.POLICIES)
+    args = parser.parse_args()
+
+    cpus = Topology.detect()
+    counts = []
+    workers = 1
+    while workers < args.max_workers:
+        counts.append(workers)
+        workers *= 2
+    counts.append(args.max_workers)
+
+    print(f"{len(cpus)} logical CPUs, engine: {Algorithms.BACKEND},"
+          + f" affinity: {args.affinity}")
+    print(f"{'workers':>8} {'hashrate':>14} {'speedup':>8}"
+          + f" {'efficiency':>10} {'start':>8} {'PSS/worker':>11}")
+
+    single = None
+    for workers in counts:
+        result = measure(workers, args, cpus)
+        if single is None:
+            single = result["hashrate"] or 1
+        speedup = result["hashrate"] / single
+        # Linear scaling is only possible up to the number of CPUs
+        ideal = min(workers * args.native_threads, len(cpus) or cpu_count())
+        ideal /= args.native_threads
+        print(f"{workers:>8} {get_prefix('H/s', result['hashrate'], 2):>14}"
+              + f" {speedup:>7.2f}x {100 * speedup / ideal:>9.1f}%"
+              + f" {result['start_time']:>7.2f}s"
+              + f" {result['memory'] / 2**20:>8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+duco-top: live dashboard for the miners running on this host
+
+Reads the status files the miners keep under
+"Duino-Coin PC Miner 4.3/Status/" (see miner_status.py) without
+talking to the miners, and redraws a table of every miner and worker.
+
+Usage:
+    python3 duco_top.py
+    python3 duco_top.py --interval 2 "/other/dir/Status"
+    python3 duco_top.py --once path/to/miner.status
+"""
+
+from time import time, sleep
+from datetime import timedelta
+from pathlib import Path
+import argparse
+import sys
+import os
+
+from fleet_protocol import prefix
+from miner_status import find_status_files, miner_alive, read_status
+
+DEFAULT_DIR = "Duino-Coin PC Miner 4.3/Status"
+# Header not refreshed for this long: the miner is gone or hung
+STALE_TIME = 10
+CLEAR = "\033[H\033[2J"
+
+
+def render(miners: list, now: float, hide_after: float) -> list:
+    lines = []
+    total_hashrate, total_accepted, total_rejected = 0.0, 0, 0
+    shown = 0
+    for path, (header, workers) in miners:
+        age = now - header.updated
+        if age > hide_after:
+            continue
+        shown += 1
+        accepted = sum(w.accepted for w in workers)
+        rejected = sum(w.rejected for w in workers)
+        state = "stale" if age > STALE_TIME else "live"
+        if state == "live":
+            total_hashrate += header.hashrate
+            total_accepted += accepted
+            total_rejected += rejected
+        uptime = timedelta(seconds=int(now - header.started))
+        lines.append(f"pid {header.pid} ∙ {header.username} ∙ rig"
+                     + f" {header.rig} ∙ {header.backend} ∙ up {uptime}"
+                     + f" ∙ {prefix(header.hashrate)}"
+                     + f" ∙ {accepted}/{accepted + rejected} accepted"
+                     + f" ∙ {state}")
+        lines.append(f"  {'id':>4} {'hashrate':>12} {'acc':>7} {'rej':>5}"
+                     + f" {'blk':>4} {'diff':>9} {'share':>7} {'ping':>7}"
+                     + f" {'seen':>6}  node")
+        for id, w in enumerate(workers):
+            if not w.updated:
+                lines.append(f"  {id:>4} {'starting':>12}")
+                continue
+            lines.append(f"  {id:>4} {prefix(w.hashrate):>12}"
+                         + f" {w.accepted:>7} {w.rejected:>5} {w.blocks:>4}"
+                         + f" {w.difficulty:>9} {w.share_time:>6.1f}s"
+                         + f" {w.ping:>5.0f}ms {now - w.updated:>5.0f}s"
+                         + f"  {w.node}:{w.port}")
+        lines.append("")
+    lines.append(f"{shown} miners ∙ {prefix(total_hashrate)} ∙"
+                 + f" {total_accepted}/{total_accepted + total_rejected}"
+                 + " accepted")
+    return lines
+
+
+def load(paths: list) -> list:
+    files = []
+    for path in paths:
+        if Path(path).is_dir():
+            files.extend(find_status_files(path))
+        else:
+            files.append(path)
+    miners = []
+    for path in files:
+        try:
+            status = read_status(path)
+        except OSError:
+            continue
+        # A killed miner leaves its file behind
+        if status and miner_alive(status[0].pid):
+            miners.append((path, status))
+    return miners
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Live dashboard for the miners on this host")
+    parser.add_argument("paths", nargs="*", default=[DEFAULT_DIR],
+                        help="status files or directories holding them")
+    parser.add_argument("-i", "--interval", type=float, default=1,
+                        help="seconds between refreshes")
+    parser.add_argument("--hide-after", type=float, default=300,
+                        help="hide miners stale for this many seconds")
+    parser.add_argument("--once", action="store_true",
+                        help="print one snapshot and exit")
+    args = parser.parse_args(argv)
+
+    if sys.platform == "win32":
+        os.system("")  # Enable VT100 escape sequences
+
+    try:
+        while True:
+            lines = render(load(args.paths), time(), args.hide_after)
+            if args.once:
+                print("\n".join(lines))
+                return 0
+            sys.stdout.write(CLEAR + "\n".join(lines) + "\n")
+            sys.stdout.flush()
+            sleep(args.interval)
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
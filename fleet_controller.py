@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Fleet controller for miners running on many hosts
+
+Miners started with "PC_Miner.py --agent host:port" connect here
+instead of reading their own Settings.cfg, fetching a node and checking
+the mining key. The controller answers every agent with its settings
+(accounts, difficulty tier, worker count) and a pool node, assigning
+nodes so each one gets about the same number of workers, then collects
+a small binary stats record from every agent and prints one table.
+
+The protocol lives in fleet_protocol.py, which the miner imports too.
+
+Controller file (ini):
+    [Controller]
+    listen = 0.0.0.0:2812
+    nodes = 1.2.3.4:2811, 5.6.7.8:2812
+
+    [Agent default]          settings for every agent
+    username = my_wallet
+    threads = auto
+
+    [Agent build-server]     overrides for the agent with this host name
+    threads = 4
+    start_diff = NET
+
+    [Session second]         extra accounts, pushed to every agent
+    username = other_wallet
+
+Usage:
+    python3 fleet_controller.py controller.cfg
+    python3 fleet_controller.py controller.cfg --listen 127.0.0.1:2812
+"""
+
+from configparser import ConfigParser
+from threading import Thread, Lock
+from time import time, sleep
+from datetime import timedelta
+import argparse
+import socket
+import struct
+import json
+import sys
+
+from fleet_protocol import (HELLO, CONFIG, STATS, parse_address,
+                            prefix, recv_frame, send_json, unpack_stats)
+
+DEFAULT_LISTEN = "0.0.0.0:2812"
+CONTROLLER_SECTION = "Controller"
+AGENT_SECTION = "Agent "
+SESSION_SECTION = "Session "
+# Agents silent for this long are shown as waiting
+AGENT_TIMEOUT = 30
+CLEAR = "\033[H\033[2J"
+
+
+class Agent:
+    def __init__(self, address: tuple, hello: dict, workers: int,
+                 node: tuple):
+        self.address = address
+        self.hello = hello
+        self.workers = workers
+        self.node = node
+        self.connected = time()
+        self.stats = None
+        self.seen = time()
+
+
+class Controller:
+    """
+    Hands out settings and nodes to agents and keeps the last stats
+    record of each. One thread per agent connection
+    """
+    def __init__(self, config: ConfigParser):
+        self.config = config
+        section = config[CONTROLLER_SECTION] if config.has_section(
+            CONTROLLER_SECTION) else {}
+        self.nodes = [parse_address(node)
+                      for node in section.get("nodes", "").split(",")
+                      if node.strip()]
+        self.agents = {}
+        self.lock = Lock()
+        self.started = time()
+
+    def settings_for(self, host: str, cpus: int) -> dict:
+        settings = {"threads": "auto"}
+        for name in (AGENT_SECTION + "default", AGENT_SECTION + host):
+            if self.config.has_section(name):
+                settings.update(self.config[name])
+        if settings["threads"] == "auto":
+            settings["threads"] = str(max(1, cpus))
+        return settings
+
+    def sessions(self) -> dict:
+        return {name[len(SESSION_SECTION):]: dict(self.config[name])
+                for name in self.config.sections()
+                if name.startswith(SESSION_SECTION)}
+
+    def assign_node(self, workers: int) -> tuple:
+        """
+        Node with the fewest workers assigned, None lets the agent
+        pick one itself. Agents count with the workers they report
+        running, which --calibrate on the agent may have changed
+        """
+        if not self.nodes:
+            return None
+        load = {node: 0 for node in self.nodes}
+        for agent in self.agents.values():
+            if agent.node in load:
+                load[agent.node] += (agent.stats.workers if agent.stats
+                                     else agent.workers)
+        return min(self.nodes, key=lambda node: load[node])
+
+    def handle(self, sock, address: tuple):
+        key = f"{address[0]}:{address[1]}"
+        try:
+            kind, payload = recv_frame(sock)
+            if kind != HELLO:
+                raise ValueError("expected HELLO")
+            hello = json.loads(payload)
+            settings = self.settings_for(hello.get("host", ""),
+                                         int(hello.get("cpus", 1)))
+            with self.lock:
+                if hello.get("node"):
+                    # Already mining: keep its node in the balance
+                    node = parse_address(hello["node"])
+                else:
+                    node = self.assign_node(int(settings["threads"]))
+                self.agents[key] = Agent(address, hello,
+                                         int(settings["threads"]), node)
+            send_json(sock, CONFIG, {
+                "settings": settings,
+                "sessions": self.sessions(),
+                "node": f"{node[0]}:{node[1]}" if node else ""})
+
+            while True:
+                kind, payload = recv_frame(sock)
+                if kind == STATS:
+                    agent = self.agents[key]
+                    agent.stats = unpack_stats(payload)
+                    agent.seen = time()
+        except (OSError, ValueError, TypeError, AttributeError,
+                struct.error) as e:
+            # Malformed frames (bad JSON, a HELLO that isn't an object,
+            # a short STATS payload) only drop this agent
+            print(f"agent {key} disconnected: {e}")
+        finally:
+            with self.lock:
+                self.agents.pop(key, None)
+            sock.close()
+
+    def serve(self, listen: tuple):
+        server = socket.socket()
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind(listen)
+        server.listen(128)
+        while True:
+            sock, address = server.accept()
+            Thread(target=self.handle, args=[sock, address],
+                   daemon=True).start()
+
+    def render(self, now: float) -> list:
+        lines = [f"controller ∙ up {timedelta(seconds=int(now - self.started))}"
+                 + f" ∙ {len(self.agents)} agents"]
+        lines.append(f"  {'host':<20} {'workers':>7} {'hashrate':>12}"
+                     + f" {'acc':>7} {'rej':>5} {'blk':>4} {'share':>6}"
+                     + f" {'restarts':>8} {'incidents':>9}  node")
+        totals = [0, 0.0, 0, 0, 0, 0, 0]
+        with self.lock:
+            agents = list(self.agents.values())
+        for agent in sorted(agents, key=lambda a: a.hello.get("host", "")):
+            host = str(agent.hello.get("host", agent.address[0]))[:20]
+            node = f"{agent.node[0]}:{agent.node[1]}" if agent.node else "own"
+            stats = agent.stats
+            if not stats or now - agent.seen > AGENT_TIMEOUT:
+                lines.append(f"  {host:<20} {agent.workers:>7}"
+                             + f" {'waiting':>12}  {node}")
+                continue
+            lines.append(f"  {host:<20} {stats.workers:>7}"
+                         + f" {prefix(stats.average):>12}"
+                         + f" {stats.accepted:>7} {stats.rejected:>5}"
+                         + f" {stats.blocks:>4} {stats.share_p50:>5.1f}s"
+                         + f" {stats.restarts:>8} {stats.incidents:>9}"
+                         + f"  {node}")
+            for n, value in enumerate((stats.workers, stats.average,
+                                       stats.accepted, stats.rejected,
+                                       stats.blocks, stats.restarts,
+                                       stats.incidents)):
+                totals[n] += value
+        lines.append(f"  {'total':<20} {totals[0]:>7}"
+                     + f" {prefix(totals[1]):>12} {totals[2]:>7}"
+                     + f" {totals[3]:>5} {totals[4]:>4} {'':>6}"
+                     + f" {totals[5]:>8} {totals[6]:>9}")
+        return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Coordinate PC Miner agents on many hosts")
+    parser.add_argument("config", help="controller ini file")
+    parser.add_argument("--listen", default=None,
+                        help=f"address to listen on (default {DEFAULT_LISTEN})")
+    parser.add_argument("-i", "--interval", type=float, default=5,
+                        help="seconds between table refreshes")
+    parser.add_argument("--plain", action="store_true",
+                        help="append tables instead of redrawing the screen")
+    args = parser.parse_args(argv)
+
+    config = ConfigParser()
+    if not config.read(args.config, encoding="utf-8"):
+        print(f"can't read {args.config}")
+        return 1
+    listen = args.listen or config.get(CONTROLLER_SECTION, "listen",
+                                       fallback=DEFAULT_LISTEN)
+    controller = Controller(config)
+    Thread(target=controller.serve, args=[parse_address(listen)],
+           daemon=True).start()
+    print(f"listening on {listen}, {len(controller.nodes)} nodes")
+
+    try:
+        while True:
+            sleep(args.interval)
+            lines = controller.render(time())
+            if args.plain:
+                print("\n".join(lines), flush=True)
+            else:
+                sys.stdout.write(CLEAR + "\n".join(lines) + "\n")
+                sys.stdout.flush()
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
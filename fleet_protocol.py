@@ -0,0 +1,92 @@
+"""
+Fleet controller protocol, shared by fleet_controller.py and the
+miners it manages (PC_Miner.py --agent), plus the hashrate formatting
+the command line dashboards use.
+
+Protocol (plain TCP, little endian frames):
+    frame   magic, kind, payload length, payload
+    HELLO   agent -> controller, JSON: host, pid, cpus, backend, version
+            and, when reconnecting while mining, the node in use
+    CONFIG  controller -> agent, JSON: settings, sessions, node
+    STATS   agent -> controller, STATS_FORMAT record every few seconds
+"""
+
+from collections import namedtuple
+import struct
+import json
+
+MAGIC = b"DUCF"
+FRAME = struct.Struct("<4sBI")
+HELLO, CONFIG, STATS = 1, 2, 3
+# Frames larger than this are a protocol error, not a config
+MAX_FRAME = 1 << 20
+STATS_FORMAT = struct.Struct("<dHddIIIIIIdIf")
+
+# Agents fill what neither the controller nor their own Settings.cfg
+# sets from these, so hosts that never ran the miner need no setup
+AGENT_DEFAULTS = {
+    "username": "",
+    "mining_key": "None",
+    "intensity": "95",
+    "threads": "auto",
+    "start_diff": "MEDIUM",
+    "donate": "0",
+    "identifier": "None",
+    "algorithm": "DUCO-S1",
+    "language": "english",
+    "soc_timeout": "10",
+    "report_sec": "300",
+    "raspi_leds": "y",
+    "raspi_cpu_iot": "y",
+    "discord_rp": "n",
+}
+
+Stats = namedtuple("Stats", ["sent", "workers", "hashrate", "average",
+                             "accepted", "rejected", "blocks", "aborts",
+                             "restarts", "incidents", "downtime",
+                             "tier_switches", "share_p50"])
+
+
+def send_frame(sock, kind: int, payload: bytes):
+    sock.sendall(FRAME.pack(MAGIC, kind, len(payload)) + payload)
+
+
+def recv_exact(sock, size: int) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionResetError("connection closed")
+        data += chunk
+    return bytes(data)
+
+
+def recv_frame(sock) -> tuple:
+    magic, kind, size = FRAME.unpack(recv_exact(sock, FRAME.size))
+    if magic != MAGIC or size > MAX_FRAME:
+        raise ValueError("not a fleet controller frame")
+    return kind, recv_exact(sock, size)
+
+
+def send_json(sock, kind: int, message: dict):
+    send_frame(sock, kind, json.dumps(message).encode("utf-8"))
+
+
+def pack_stats(stats: Stats) -> bytes:
+    return STATS_FORMAT.pack(*stats)
+
+
+def unpack_stats(payload: bytes) -> Stats:
+    return Stats(*STATS_FORMAT.unpack(payload))
+
+
+def parse_address(text: str) -> tuple:
+    host, port = text.strip().rsplit(":", 1)
+    return host, int(port)
+
+
+def prefix(value: float, unit: str = "H/s") -> str:
+    for scale, name in ((1e9, "G"), (1e6, "M"), (1e3, "k")):
+        if value >= scale:
+            return f"{value / scale:.2f} {name}{unit}"
+    return f"{value:.0f} {unit}"
@@ -0,0 +1,84 @@
+"""
+Job capture files, shared by the miner (which writes them) and
+job_replay.py (which reads them back), plus the percentile helper
+both use for their statistics.
+
+Format: 8 byte magic, then per job one fixed CAPTURE_RECORD followed
+by last_h.
+"""
+
+from collections import namedtuple
+from time import time
+import struct
+
+CAPTURE_MAGIC = b"DUCOCAP1"
+# arrival time, difficulty, expected hash, length of last_h
+CAPTURE_RECORD = struct.Struct("<dQ20sH")
+
+Job = namedtuple("Job", ["arrival", "last_h", "expected", "diff"])
+
+
+class JobCapture:
+    """
+    Appends received jobs to a compact binary capture file:
+    8 byte magic, then one fixed 38 byte record + last_h per job
+    """
+    def __init__(self, path: str):
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            self.file.write(CAPTURE_MAGIC)
+            self.file.flush()
+
+    def record(self, last_h: str, exp_h: str, diff: int, arrival: float = None):
+        base = last_h.encode("ascii")
+        if arrival is None:
+            arrival = time()
+        self.file.write(CAPTURE_RECORD.pack(arrival, int(diff),
+                                            bytes.fromhex(exp_h), len(base))
+                        + base)
+        # Jobs arrive seconds apart, flushing keeps killed miners' captures
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def read_capture(path: str) -> list:
+    """
+    Reads all complete job records from a capture file.
+    A record truncated by a killed miner is ignored
+    """
+    jobs = []
+    with open(path, "rb") as f:
+        if f.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+            raise ValueError(f"{path} is not a job capture file")
+        while True:
+            header = f.read(CAPTURE_RECORD.size)
+            if len(header) < CAPTURE_RECORD.size:
+                break
+            arrival, diff, expected, base_len = CAPTURE_RECORD.unpack(header)
+            base = f.read(base_len)
+            if len(base) < base_len:
+                break
+            jobs.append(Job(arrival, base.decode("ascii"), expected, diff))
+    return jobs
+
+
+def load_stream(paths: list) -> list:
+    """
+    Merges capture files into one stream ordered by arrival time.
+    Ties are broken by file order and position so replays are deterministic
+    """
+    keyed = []
+    for file_index, path in enumerate(paths):
+        for position, job in enumerate(read_capture(path)):
+            keyed.append(((job.arrival, file_index, position), job))
+    keyed.sort(key=lambda item: item[0])
+    return [job for _, job in keyed]
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Job stream capture and offline replay for libducohasher
+
+The miner writes every job it receives to a capture file when
+capture_jobs = y is set in Settings.cfg. This tool feeds one or more
+of those files back to the native hasher across N worker processes
+and reports throughput and latency, so engine builds can be compared
+on the real job mix instead of synthetic jobs.
+
+Usage:
+    python3 job_replay.py "Duino-Coin PC Miner 4.3/Captures/"*.dcap
+    python3 job_replay.py jobs.dcap --workers 4 --speed recorded
+"""
+
+from time import sleep, monotonic
+from multiprocessing import Process, Queue, cpu_count
+import argparse
+import hashlib
+import struct
+import json
+import sys
+
+from job_capture import Job, load_stream, percentile
+
+def check_nonce(job: Job, nonce: int) -> bool:
+    digest = hashlib.sha1((job.last_h + str(nonce)).encode("ascii")).digest()
+    return digest == job.expected
+
+
+def replay_worker(schedule: list, job_mul: int, start_at: float, results):
+    """
+    Hashes a fixed list of (index, job, release offset) entries in order,
+    waiting for each job's release time when replaying at recorded speed
+    """
+    import libducohasher
+
+    for index, job, release in schedule:
+        release_at = start_at + release
+        delay = release_at - monotonic()
+        if delay > 0:
+            sleep(delay)
+
+        hash_start = monotonic()
+        hasher = libducohasher.DUCOHasher(job.last_h.encode("ascii"))
+        nonce, _ = hasher.DUCOS1(job.expected, job.diff, job_mul)
+        hash_end = monotonic()
+
+        results.put((index, nonce, release_at, hash_start, hash_end))
+    results.put(None)
+
+
+def replay(jobs: list, workers: int, speed: float, job_mul: int) -> dict:
+    """
+    Replays jobs across workers. Job i always goes to worker i % workers,
+    speed 0 releases everything at once, 1 keeps the recorded spacing
+    """
+    first_arrival = jobs[0].arrival
+    schedules = [[] for _ in range(workers)]
+    for index, job in enumerate(jobs):
+        release = (job.arrival - first_arrival) / speed if speed else 0.0
+        schedules[index % workers].append((index, job, release))
+
+    results = Queue()
+    # Give every process time to start so no worker begins late
+    start_at = monotonic() + 0.5 + workers * 0.02
+    processes = [Process(target=replay_worker,
+                         args=[schedule, job_mul, start_at, results])
+                 for schedule in schedules]
+    for p in processes:
+        p.start()
+
+    outcomes = [None] * len(jobs)
+    finished = 0
+    while finished < workers:
+        item = results.get()
+        if item is None:
+            finished += 1
+        else:
+            outcomes[item[0]] = item[1:]
+    for p in processes:
+        p.join()
+
+    hashes, misses = 0, 0
+    latencies, service_times = [], []
+    nonces = hashlib.sha1()
+    last_end = start_at
+    for job, (nonce, release_at, hash_start, hash_end) in zip(jobs, outcomes):
+        if nonce == 0 and not check_nonce(job, 0):
+            misses += 1
+            hashes += job.diff * job_mul + 1
+        else:
+            hashes += nonce + 1
+        nonces.update(struct.pack("<Q", nonce))
+        latencies.append(hash_end - release_at)
+        service_times.append(hash_end - hash_start)
+        last_end = max(last_end, hash_end)
+
+    wall = max(last_end - start_at, 1e-9)
+    return {
+        "jobs": len(jobs),
+        "workers": workers,
+        "speed": "max" if not speed else speed,
+        "job_mul": job_mul,
+        "wall_time": wall,
+        "hashes": hashes,
+        "hashrate": hashes / wall,
+        "jobs_per_sec": len(jobs) / wall,
+        "misses": misses,
+        "latency_p50": percentile(latencies, 50),
+        "latency_p95": percentile(latencies, 95),
+        "latency_max": max(latencies),
+        "service_p50": percentile(service_times, 50),
+        "service_p95": percentile(service_times, 95),
+        "result_digest": nonces.hexdigest(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Replay captured DUCO jobs against libducohasher")
+    parser.add_argument("captures", nargs="+",
+                        help="capture files written by the miner")
+    parser.add_argument("-w", "--workers", type=int, default=cpu_count(),
+                        help="worker processes (default: all cores)")
+    parser.add_argument("-s", "--speed", default="max",
+                        help="'max', 'recorded' or a multiple of recorded speed")
+    parser.add_argument("--job-mul", type=int, default=100,
+                        help="search range multiplier, as job_mul in Settings.cfg")
+    parser.add_argument("-n", "--limit", type=int, default=0,
+                        help="only replay the first N jobs of the stream")
+    parser.add_argument("--json", action="store_true",
+                        help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    if args.speed == "max":
+        speed = 0.0
+    elif args.speed == "recorded":
+        speed = 1.0
+    else:
+        speed = float(args.speed)
+
+    jobs = load_stream(args.captures)
+    if args.limit:
+        jobs = jobs[:args.limit]
+    if not jobs:
+        print("No jobs found in capture files")
+        return 1
+
+    report = replay(jobs, max(1, args.workers), speed, args.job_mul)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+
+    print(f"Replayed {report['jobs']} jobs on {report['workers']} workers"
+          + f" (speed: {report['speed']}, job_mul: {report['job_mul']})")
+    print(f"  wall time:  {report['wall_time']:.2f}s")
+    print(f"  throughput: {report['hashrate'] / 1e6:.2f} MH/s,"
+          + f" {report['jobs_per_sec']:.2f} jobs/s")
+    print(f"  latency:    p50 {report['latency_p50'] * 1000:.1f}ms,"
+          + f" p95 {report['latency_p95'] * 1000:.1f}ms,"
+          + f" max {report['latency_max'] * 1000:.1f}ms")
+    print(f"  hashing:    p50 {report['service_p50'] * 1000:.1f}ms,"
+          + f" p95 {report['service_p95'] * 1000:.1f}ms")
+    print(f"  misses:     {report['misses']}")
+    print(f"  results:    {report['result_digest']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Live miner status in a memory-mapped file
+
+Every miner keeps one small fixed-layout file under
+"Duino-Coin PC Miner 4.3/Status/": a header written by the main
+process once per second and one slot per worker, written in place by
+that worker after each share. Readers such as duco_top.py map the
+file read-only, so watching a miner needs no IPC and costs it nothing.
+
+Layout (little endian):
+    header  magic, version, workers, pid, started, updated,
+            hashrate, username, rig, backend
+    slot    seq, accepted, rejected, blocks, difficulty, hashrate,
+            share time, ping, updated, node port, node host
+A slot's seq is odd while the worker is writing it, readers retry
+until they see the same even value before and after reading.
+A miner that was killed leaves its file behind, so readers also check
+that the header's pid is still running.
+"""
+
+from collections import namedtuple
+from pathlib import Path
+from time import time
+import mmap
+import struct
+import sys
+import os
+
+STATUS_MAGIC = b"DUCOSTA1"
+STATUS_VERSION = 1
+STATUS_SUFFIX = ".status"
+HEADER = struct.Struct("<8sHHIddd32s32s8s")
+SLOT = struct.Struct("<IIIIQddddH48s")
+READ_RETRIES = 5
+
+Header = namedtuple("Header", ["magic", "version", "workers", "pid",
+                               "started", "updated", "hashrate",
+                               "username", "rig", "backend"])
+Worker = namedtuple("Worker", ["seq", "accepted", "rejected", "blocks",
+                               "difficulty", "hashrate", "share_time",
+                               "ping", "updated", "port", "node"])
+
+
+def status_size(workers: int) -> int:
+    return HEADER.size + workers * SLOT.size
+
+
+def _text(value: str, size: int) -> bytes:
+    return str(value).encode("utf-8")[:size]
+
+
+class StatusFile:
+    """
+    Writable view of a status file. The main process creates it,
+    workers attach to the same path and only write their own slot
+    """
+    def __init__(self, path: str, workers: int, create: bool = False):
+        self.path = path
+        self.workers = workers
+        mode = "w+b" if create else "r+b"
+        self.file = open(path, mode)
+        if create:
+            self.file.truncate(status_size(workers))
+        self.map = mmap.mmap(self.file.fileno(), status_size(workers))
+        self.seq = [0] * workers
+
+    def create(path: str, workers: int, pid: int, username: str,
+               rig: str, backend: str):
+        status = StatusFile(path, workers, create=True)
+        status.pid = pid
+        status.fields = (_text(username, 32), _text(rig, 32),
+                         _text(backend, 8))
+        status.started = time()
+        status.update_header(0.0)
+        return status
+
+    def attach(path: str, workers: int):
+        return StatusFile(path, workers)
+
+    def update_header(self, hashrate: float):
+        HEADER.pack_into(self.map, 0, STATUS_MAGIC, STATUS_VERSION,
+                         self.workers, self.pid, self.started, time(),
+                         hashrate, *self.fields)
+
+    def update_worker(self, id: int, accepted: int, rejected: int,
+                      blocks: int, difficulty: int, hashrate: float,
+                      share_time: float, ping: float, node: tuple):
+        offset = HEADER.size + id * SLOT.size
+        self.seq[id] += 1
+        # Odd sequence number: slot is being written
+        struct.pack_into("<I", self.map, offset, self.seq[id] * 2 - 1)
+        SLOT.pack_into(self.map, offset, self.seq[id] * 2 - 1, accepted,
+                       rejected, blocks, int(difficulty), hashrate,
+                       share_time, ping, time(), int(node[1]),
+                       _text(node[0], 48))
+        struct.pack_into("<I", self.map, offset, self.seq[id] * 2)
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+def read_status(path: str) -> tuple:
+    """
+    (Header, [Worker, ...]) of one status file, or None if the file
+    is not a complete status file or a slot kept changing under us
+    """
+    with open(path, "rb") as f:
+        try:
+            view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file, the miner is still creating it
+            return None
+    with view:
+        if len(view) < HEADER.size:
+            return None
+        header = Header(*HEADER.unpack_from(view, 0))
+        if (header.magic != STATUS_MAGIC
+                or header.version != STATUS_VERSION
+                or len(view) < status_size(header.workers)):
+            return None
+        header = header._replace(
+            username=header.username.rstrip(b"\0").decode("utf-8", "replace"),
+            rig=header.rig.rstrip(b"\0").decode("utf-8", "replace"),
+            backend=header.backend.rstrip(b"\0").decode("utf-8", "replace"))
+
+        workers = []
+        for id in range(header.workers):
+            offset = HEADER.size + id * SLOT.size
+            for _ in range(READ_RETRIES):
+                slot = SLOT.unpack_from(view, offset)
+                seq = struct.unpack_from("<I", view, offset)[0]
+                if slot[0] == seq and not seq % 2:
+                    break
+            else:
+                # Still torn, the next refresh reads it again
+                return None
+            worker = Worker(*slot)
+            workers.append(worker._replace(
+                node=worker.node.rstrip(b"\0").decode("utf-8", "replace")))
+        return header, workers
+
+
+def miner_alive(pid: int) -> bool:
+    """
+    Whether a process with this pid is running on this host
+    """
+    if sys.platform == "win32":
+        # os.kill(pid, 0) would terminate the process on Windows
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)
+        if not handle:
+            return False
+        code = ctypes.c_ulong()
+        kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+        kernel32.CloseHandle(handle)
+        return code.value == 259  # STILL_ACTIVE
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def find_status_files(directory: str) -> list:
+    return sorted(str(p) for p in Path(directory).glob("*" + STATUS_SUFFIX))
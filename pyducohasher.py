@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Pure-Python DUCO-S1 engine, used by the miner when libducohasher
+can't be imported (no Rust toolchain, new architectures, locked-down
+hosts). It has the same interface as the native module but is much
+slower: benchmarks/fallback.py measures the gap on the host.
+
+The prefix is hashed once and its SHA1 state copied for every nonce,
+nonces are encoded in batches, and with threads > 1 a job is split
+across a pool of processes that stop as soon as one finds the nonce.
+"""
+
+from multiprocessing import Pool, Value, cpu_count
+from threading import Lock
+from time import time
+import hashlib
+
+BACKEND = "python"
+
+# Nonces encoded at once
+BATCH_SIZE = 4096
+# Nonces per pool task: large enough to hide the IPC, small enough
+# that a found nonce stops the other processes quickly
+TASK_SIZE = 65536
+
+_pool = None
+_pool_size = 0
+_job_id = 0
+# Highest job id whose nonce was found, shared with the pool processes
+_found = None
+# One pooled job at a time per process, the pool already uses every process
+_pool_lock = Lock()
+
+
+def scan(prefix, expected: bytes, start: int, end: int,
+         job_id: int = 0, deadline: float = None) -> tuple:
+    """
+    Returns (nonce, hashed): the first nonce in start..end whose digest
+    is expected, or -1 (also once the deadline passes), and how many
+    nonces were hashed. prefix is a hashlib.sha1 object already fed
+    with the job base
+    """
+    copy = prefix.copy
+    for batch_start in range(start, end, BATCH_SIZE):
+        if job_id and _found.value >= job_id:
+            return -1, batch_start - start
+        if deadline and time() >= deadline:
+            return -1, batch_start - start
+        batch_end = min(batch_start + BATCH_SIZE, end)
+        nonces = "\n".join(map(str, range(batch_start, batch_end)))
+        for offset, encoded in enumerate(nonces.encode("ascii").split(b"\n")):
+            h = copy()
+            h.update(encoded)
+            if h.digest() == expected:
+                return batch_start + offset, batch_start + offset + 1 - start
+    return -1, end - start
+
+
+def _init_pool(found):
+    global _found
+    _found = found
+
+
+def _scan_task(task: tuple) -> tuple:
+    base, expected, start, end, job_id, deadline = task
+    if _found.value >= job_id:
+        return -1, 0
+    nonce, hashed = scan(hashlib.sha1(base), expected, start, end, job_id,
+                         deadline)
+    if nonce >= 0:
+        with _found.get_lock():
+            _found.value = max(_found.value, job_id)
+    return nonce, hashed
+
+
+def _get_pool(size: int):
+    global _pool, _pool_size, _found
+    if _pool is None or _pool_size != size:
+        if _pool is not None:
+            _pool.terminate()
+        _found = Value("q", 0)
+        _pool = Pool(size, initializer=_init_pool, initargs=[_found])
+        _pool_size = size
+    return _pool
+
+
+class DUCOHasher:
+    def __init__(self, data: bytes):
+        self.base_data = bytes(data)
+
+    def DUCOS1(self, expected_hash: bytes, diff: int, job_mul: int,
+               threads: int = 1, timeout: float = None) -> tuple:
+        """
+        Searches nonces 0..=diff*job_mul, returns (nonce, hashed) with
+        nonce 0 if none match or timeout seconds pass. threads > 1 fans
+        the range out to a process pool, 0 uses every CPU
+        """
+        global _job_id
+        expected = bytes(expected_hash)
+        end = diff * job_mul + 1
+        threads = threads or cpu_count()
+        deadline = time() + timeout if timeout is not None else None
+        if threads == 1 or end <= TASK_SIZE:
+            nonce, hashed = scan(hashlib.sha1(self.base_data), expected, 0,
+                                 end, deadline=deadline)
+            return max(0, nonce), hashed
+
+        with _pool_lock:
+            pool = _get_pool(threads)
+            _job_id += 1
+            tasks = [(self.base_data, expected, start,
+                      min(start + TASK_SIZE, end), _job_id, deadline)
+                     for start in range(0, end, TASK_SIZE)]
+            total = 0
+            for nonce, hashed in pool.imap_unordered(_scan_task, tasks):
+                total += hashed
+                if nonce >= 0:
+                    # Tasks still queued see _found and return at once
+                    return nonce, total
+            return 0, total